@@ -1,13 +1,8 @@
 import streamlit as st
 import torch
-import os
 from dotenv import load_dotenv
-from PyPDF2 import PdfReader
-from langchain.text_splitter import CharacterTextSplitter
-from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_community.vectorstores import FAISS
 from langchain.chains import ConversationalRetrievalChain
-from langchain_groq import ChatGroq
 from langchain.memory import ConversationBufferMemory
 from langchain.prompts import PromptTemplate  # ✅ added this
 from html_Templates import css, bot_template, user_template
@@ -19,11 +14,17 @@ import base64
 import time  # Add this import at the top if not already present
 from youtubesearchpython import VideosSearch
 
-from summarize_agent import get_summarization_agent
-from langchain.text_splitter import CharacterTextSplitter
 import json
-from unit import extract_units_from_notes  # Importing the unit extraction function
+from services.unit import extract_units_from_notes
+from services.artifact_cache import get_artifact_cache
+from services.llm_gateway import INTERACTIVE, chat_model
+from services.prompt_versions import STUDY_PLAN_MODEL, STUDY_PLAN_PROMPT_VERSION
 from resourses import get_top_youtube_videos  # Importing the YouTube video fetching function
+from services.pdf_extract import extract_pages
+from services.embeddings import get_embeddings
+from services.text_splitter import split_pages
+# Bump when the topic, flashcard or MCQ prompts below change, so cached outputs are not reused
+APP_PROMPT_VERSION = "1"
 # -------- Custom Prompt --------
 CUSTOM_PROMPT = PromptTemplate(
     input_variables=["context", "question", "chat_history"],
@@ -48,12 +49,11 @@ Answer:
 
 # -------- PDF Text Extraction --------
 def get_pdf_text(pdf_docs):
-    text = ""
+    texts = []
     for pdf in pdf_docs:
-        pdf_reader = PdfReader(pdf)
-        for page in pdf_reader.pages:
-            text += page.extract_text() + "\n"
-    return text
+        pages = extract_pages(pdf.getvalue())
+        texts.append("".join(page_text + "\n" for _, page_text in pages))
+    return "".join(texts)
 
 def parse_view_count(text):
     """
@@ -74,34 +74,23 @@ def parse_view_count(text):
 
 # -------- Text Chunking --------
 def get_text_chunks(raw_text):
-    text_splitter = CharacterTextSplitter(
-        separator="\n",
-        chunk_size=1000,
-        chunk_overlap=200,
-        length_function=len
-    )
-    chunks = text_splitter.split_text(raw_text)
+    chunks = [chunk.text for chunk in split_pages([(1, raw_text)])]
     return chunks
 
 
 # -------- Vector Store Creation --------
-from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_community.vectorstores import FAISS
 
 def get_vectorstore(text_chunks):
-    embedding = HuggingFaceEmbeddings(
-        model_name="BAAI/bge-m3",
-        model_kwargs={"device": "cpu"},  # Force CPU to avoid meta tensor error
-        encode_kwargs={"normalize_embeddings": True}
-    )
-    vector_store = FAISS.from_texts(text_chunks, embedding=embedding)
+    # Shared, process-wide model: Streamlit reruns no longer reload the weights
+    vector_store = FAISS.from_texts(text_chunks, embedding=get_embeddings())
     return vector_store
 
 
 
 # -------- Conversation Chain using Groq --------
 def get_conversation_chain(vector_store):
-    llm = ChatGroq(model="llama3-8b-8192", api_key=os.getenv("GROQ_API_KEY"))
+    llm = chat_model("llama3-8b-8192", priority=INTERACTIVE)
 
     memory = ConversationBufferMemory(
         memory_key="chat_history",
@@ -199,7 +188,11 @@ def extract_topics(note_text):
 
         List only keywords or topic titles, no descriptions.
         """
-    return ChatGroq(model="llama3-8b-8192", api_key=os.getenv("GROQ1_API_KEY")).invoke(prompt).content.split("\n")
+    response = get_artifact_cache().get_or_create(
+        "topics", APP_PROMPT_VERSION, "llama3-8b-8192", prompt,
+        lambda: chat_model("llama3-8b-8192").invoke(prompt).content
+    )
+    return response.split("\n")
 
 def extract_json_from_llm_response(response_text):
     """
@@ -276,7 +269,7 @@ def main():
                     text_chunks = get_text_chunks(raw_text)
                     vector_store = get_vectorstore(text_chunks)
                     st.session_state.conversation = get_conversation_chain(vector_store)
-                    st.session_state.full_text = "\n".join(text_chunks)  # ✅ Store full_text globally
+                    st.session_state.full_text = raw_text  # canonical text, without chunk overlap
 
 
         if st.session_state.paired_display_history:
@@ -310,8 +303,7 @@ def main():
                 """, unsafe_allow_html=True)
 
     # ----------- Tab 2: Unit Summarization -----------
-    from summarize_agent import get_summarization_agent
-    from summarize_agent import get_summarization_agent
+    from services.summary_pipeline import summarize_text_blocking
     
 
     with tab2:
@@ -320,38 +312,28 @@ def main():
 
         if st.session_state.conversation:
             with st.spinner("Summarizing..."):
-                retriever = st.session_state.conversation.retriever
-                all_docs = retriever.vectorstore.docstore._dict.values()
-                full_text = "\n".join([doc.page_content for doc in all_docs])
+                full_text = st.session_state.full_text
 
                 units = extract_units_from_notes(full_text)
 
                 if not units:
                     st.warning("No units detected. Summarizing the entire document instead.")
-                    summarizer_agent = get_summarization_agent()
                     try:
-                        # Truncate if too long
-                        safe_content = full_text if len(full_text) < 5000 else full_text[:5000]
-                        summary = summarizer_agent.run({
-                            "unit_title": "",
-                            "content": safe_content
-                        })
+                        # Map-reduce over the whole document, sections summarized in parallel
+                        summary = summarize_text_blocking(full_text)
                         st.markdown("**Summary:**")
                         st.markdown(summary)
                     except Exception as e:
                         st.error(f"Summarization failed: {e}")
                 else:
-                    summarizer_agent = get_summarization_agent()
                     for unit_title, content in units.items():
                         if not content or not isinstance(content, str) or not content.strip():
                             continue
                         st.subheader(f"📘 {unit_title}")
                         safe_content = content if len(content) < 5000 else content[:5000]
+                        summary = ""
                         try:
-                            summary = summarizer_agent.run({
-                                "unit_title": unit_title,
-                                "content": safe_content
-                            })
+                            summary = summarize_text_blocking(content)
                             st.markdown(summary)
                         except Exception as e:
                             st.error(f"Summarization failed: {e}")
@@ -359,14 +341,16 @@ def main():
                         # --- Flashcard Generator Button ---
                         if st.button(f"Generate Flashcards for {unit_title}", key=f"flashcard_btn_{unit_title}"):
                             with st.spinner("Generating flashcards..."):
-                                from langchain_groq import ChatGroq
-                                llm = ChatGroq(model="llama3-8b-8192", api_key=os.getenv("GROQ_API_KEY"))
+                                llm = chat_model("llama3-8b-8192")
                                 prompt = (
                                     f"Create 5 flashcards (question and answer pairs) from the following unit notes:\n\n"
                                     f"{safe_content}\n\n"
                                     "Format:\nQ: ...\nA: ...\n"
                                 )
-                                flashcards = llm.invoke(prompt).content
+                                flashcards = get_artifact_cache().get_or_create(
+                                    "flashcards", APP_PROMPT_VERSION, "llama3-8b-8192", prompt,
+                                    lambda: llm.invoke(prompt).content
+                                )
                                 st.markdown("**Flashcards:**")
                                 st.markdown(flashcards)
                         # --- Export to PDF Button ---
@@ -408,15 +392,15 @@ def main():
     ----------------------
     {content[:4000]}
     """
-            from langchain_groq import ChatGroq
-            llm = ChatGroq(model="llama3-8b-8192", api_key=os.getenv("GROQ_API_KEY"))
-            return llm.invoke(prompt).content
+            llm = chat_model("llama3-8b-8192")
+            return get_artifact_cache().get_or_create(
+                "mcqs", APP_PROMPT_VERSION, "llama3-8b-8192", prompt,
+                lambda: llm.invoke(prompt).content
+            )
 
         if st.session_state.conversation:
             with st.spinner("Preparing test..."):
-                retriever = st.session_state.conversation.retriever
-                all_docs = retriever.vectorstore.docstore._dict.values()
-                full_text = "\n".join([doc.page_content for doc in all_docs])
+                full_text = st.session_state.full_text
                 units = extract_units_from_notes(full_text)
 
                 unit_titles = list(units.keys())
@@ -519,23 +503,24 @@ def main():
 
         if st.session_state.conversation:
             with st.spinner("Preparing units..."):
-                retriever = st.session_state.conversation.retriever
-                all_docs = retriever.vectorstore.docstore._dict.values()
-                full_text = "\n".join([doc.page_content for doc in all_docs])
+                full_text = st.session_state.full_text
                 units = extract_units_from_notes(full_text)
 
             if units:
                 if st.button("🗓️ Generate Personalized Study Plan"):
                     with st.spinner("Creating your study plan..."):
-                        from langchain_groq import ChatGroq
-                        llm = ChatGroq(model="llama3-8b-8192", api_key=os.getenv("GROQ_API_KEY"))
+                        llm = chat_model(STUDY_PLAN_MODEL)
                         prompt = (
                             f"You are a study planner assistant. Given these units:\n"
                             f"{list(units.keys())}\n"
                             "Create a 7-day study plan, assigning units/topics to each day. "
                             "Balance the workload and include revision days. Format as a markdown table."
                         )
-                        plan = llm.invoke(prompt).content
+                        # same key as /study-plan/, so the API and the app share plans
+                        plan = get_artifact_cache().get_or_create(
+                            "study_plan", STUDY_PLAN_PROMPT_VERSION, STUDY_PLAN_MODEL, prompt,
+                            lambda: llm.invoke(prompt).content
+                        )
                         st.markdown("**Your Study Plan:**")
                         st.markdown(plan)
             else:
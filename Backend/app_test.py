@@ -14,6 +14,7 @@ from services import chat,summarize
 from services import run_locally
 from services import generate_code
 from services import youtube_routes as resourses
+from services.embeddings import warm_up_embeddings
 load_dotenv()
 app = FastAPI()
 
@@ -32,6 +33,12 @@ app.include_router(generate_code.router)
 app.include_router(resourses.router)
 
 
+@app.on_event("startup")
+def load_embedding_model():
+    # Load bge-m3 once per worker before serving, so uploads never pay for it
+    warm_up_embeddings()
+
+
 # Pomodoro timer is best handled on the frontend (React), not backend.
 
 if __name__ == "__main__":
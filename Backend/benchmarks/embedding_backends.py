@@ -0,0 +1,77 @@
+"""Parity check and throughput benchmark: fp32 torch vs int8 ONNX bge-m3.
+
+Run from Backend/ after exporting the int8 model::
+
+    python -m benchmarks.embedding_backends --pdf notes.pdf --onnx-dir models/bge-m3-int8
+
+``--pdf`` should be a text PDF of a few dozen pages or more (the corpus).
+"""
+import argparse
+import itertools
+import time
+
+import numpy as np
+from langchain_community.embeddings import HuggingFaceEmbeddings
+
+from services.onnx_embeddings import OnnxEmbeddings
+from services.pdf_extract import extract_pages
+from services.text_splitter import split_pages
+
+
+def load_corpus(pdf_path, limit):
+    """The first ``limit`` chunks as ingestion produces them."""
+    with open(pdf_path, "rb") as f:
+        pages = extract_pages(f.read())
+    return [chunk.text for chunk in itertools.islice(split_pages(pages), limit)]
+
+
+def timed_embed(backend, texts):
+    backend.embed_documents(texts[:4])  # warm-up, excluded from timing
+    started = time.perf_counter()
+    vectors = np.asarray(backend.embed_documents(texts), dtype=np.float32)
+    return vectors, len(texts) / (time.perf_counter() - started)
+
+
+def recall_at_k(reference, candidate, k):
+    """Share of each chunk's exact top-k neighbours that the candidate vectors also retrieve."""
+    k = min(k, len(reference) - 1)
+    ref_top = np.argsort(-(reference @ reference.T), axis=1)[:, 1:k + 1]
+    cand_top = np.argsort(-(candidate @ candidate.T), axis=1)[:, 1:k + 1]
+    overlap = [len(set(r) & set(c)) / k for r, c in zip(ref_top, cand_top)]
+    return float(np.mean(overlap))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pdf", required=True, help="text PDF to build the corpus from")
+    parser.add_argument("--model", default="BAAI/bge-m3")
+    parser.add_argument("--onnx-dir", default="models/bge-m3-int8")
+    parser.add_argument("--limit", type=int, default=256, help="max chunks to embed")
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    texts = load_corpus(args.pdf, args.limit)
+    if len(texts) < 2:
+        parser.error(f"{args.pdf} yields {len(texts)} chunks; the parity check needs a PDF with extractable text")
+    print(f"Corpus: {len(texts)} chunks from {args.pdf}")
+
+    fp32 = HuggingFaceEmbeddings(
+        model_name=args.model,
+        model_kwargs={"device": "cpu"},
+        encode_kwargs={"normalize_embeddings": True}
+    )
+    int8 = OnnxEmbeddings(args.onnx_dir)
+
+    ref, fp32_rate = timed_embed(fp32, texts)
+    cand, int8_rate = timed_embed(int8, texts)
+
+    cosine = np.sum(ref * cand, axis=1)
+    print(f"{'backend':<12}{'chunks/s':>10}")
+    print(f"{'torch fp32':<12}{fp32_rate:>10.1f}")
+    print(f"{'onnx int8':<12}{int8_rate:>10.1f}   ({int8_rate / fp32_rate:.2f}x)")
+    print(f"cosine(fp32, int8): mean {cosine.mean():.4f}  min {cosine.min():.4f}")
+    print(f"recall@{args.k} of int8 neighbours vs fp32: {recall_at_k(ref, cand, args.k):.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Build time, query latency, memory and recall@k for flat / HNSW / IVF-PQ.
+
+Run from Backend/::
+
+    python -m benchmarks.index_types --n 200000 --dim 1024
+"""
+import argparse
+import time
+
+import faiss
+import numpy as np
+
+from services.index_factory import FLAT, HNSW, IVFPQ, build_index, choose_index_type, training_size
+
+
+def clustered_vectors(n, dim, clusters, seed):
+    """Unit vectors around random centroids -- closer to real chunk embeddings than uniform noise."""
+    rng = np.random.default_rng(seed)
+    centroids = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centroids[rng.integers(0, clusters, n)] + 0.5 * rng.standard_normal((n, dim)).astype(np.float32)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def build(kind, vectors):
+    started = time.perf_counter()
+    index = build_index(vectors.shape[1], len(vectors), kind)
+    train_size = training_size(index, len(vectors))
+    if train_size:
+        index.train(vectors[:train_size])
+    index.add(vectors)
+    return index, time.perf_counter() - started
+
+
+def query_latencies(index, queries, k):
+    latencies = []
+    results = []
+    for query in queries:
+        started = time.perf_counter()
+        _, ids = index.search(query[None, :], k)
+        latencies.append((time.perf_counter() - started) * 1000)
+        results.append(ids[0])
+    return np.asarray(latencies), np.asarray(results)
+
+
+def recall(found, exact):
+    k = exact.shape[1]
+    return float(np.mean([len(set(f) & set(e)) / k for f, e in zip(found, exact)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--n", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--clusters", type=int, default=256)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    vectors = clustered_vectors(args.n, args.dim, args.clusters, args.seed)
+    queries = clustered_vectors(args.queries, args.dim, args.clusters, args.seed + 1)
+    print(f"{args.n} vectors x {args.dim} dims, {args.queries} queries, auto choice: "
+          f"{choose_index_type(args.n, args.dim)}")
+
+    exact = None
+    print(f"{'index':<8}{'build s':>10}{'p50 ms':>10}{'p99 ms':>10}{'memory MB':>12}{'recall@' + str(args.k):>12}")
+    for kind in (FLAT, HNSW, IVFPQ):
+        index, build_seconds = build(kind, vectors)
+        latencies, found = query_latencies(index, queries, args.k)
+        if exact is None:
+            exact = found
+        memory_mb = faiss.serialize_index(index).nbytes / 1e6
+        print(f"{kind:<8}{build_seconds:>10.2f}{np.percentile(latencies, 50):>10.3f}"
+              f"{np.percentile(latencies, 99):>10.3f}{memory_mb:>12.1f}{recall(found, exact):>12.4f}")
+
+
+if __name__ == "__main__":
+    main()
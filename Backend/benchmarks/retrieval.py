@@ -0,0 +1,86 @@
+"""Recall@k and latency: dense-only retriever vs hybrid BM25 + dense.
+
+Queries are generated from the document itself: "lexical" queries use a
+chunk's rarest terms (formula names, acronyms, identifiers) and "natural"
+queries use its first sentence. The source chunk is the expected hit.
+
+Run from Backend/::
+
+    python -m benchmarks.retrieval --pdf notes.pdf
+
+``--pdf`` should be a text PDF of a few dozen pages or more (the corpus).
+"""
+import argparse
+import random
+import re
+import time
+
+import numpy as np
+from langchain_community.vectorstores import FAISS
+
+from services.embeddings import get_embeddings
+from services.hybrid_retriever import BM25Index, HybridRetriever, tokenize
+from services.pdf_extract import extract_pages
+from services.text_splitter import split_pages
+
+
+def build(pdf_path):
+    with open(pdf_path, "rb") as f:
+        chunks = list(split_pages(extract_pages(f.read())))
+    texts = [chunk.text for chunk in chunks]
+    if len(texts) < 2:
+        raise SystemExit(f"{pdf_path} yields {len(texts)} chunks; the benchmark needs a PDF with extractable text")
+    store = FAISS.from_texts(texts, embedding=get_embeddings(), metadatas=[{"i": i} for i in range(len(texts))])
+    mapping = store.index_to_docstore_id
+    doc_ids = [mapping[i] for i in range(len(mapping))]
+    bm25 = BM25Index(doc_ids, [store.docstore.search(d).page_content for d in doc_ids])
+    return texts, store, bm25
+
+
+def make_queries(texts, bm25, count, seed):
+    rng = random.Random(seed)
+    sample = rng.sample(range(len(texts)), min(count, len(texts)))
+    lexical, natural = [], []
+    for i in sample:
+        terms = sorted(set(tokenize(texts[i])), key=lambda t: -bm25.idf.get(t, 0))[:3]
+        if terms:
+            lexical.append((" ".join(terms), i))
+        sentence = re.split(r"(?<=[.!?])\s", texts[i].strip(), maxsplit=1)[0][:200]
+        natural.append((sentence, i))
+    return {"lexical": lexical, "natural": natural}
+
+
+def evaluate(retriever, queries):
+    hits, latencies = 0, []
+    for query, expected in queries:
+        started = time.perf_counter()
+        docs = retriever.invoke(query)
+        latencies.append((time.perf_counter() - started) * 1000)
+        hits += any(doc.metadata.get("i") == expected for doc in docs)
+    return hits / len(queries), np.percentile(latencies, 50), np.percentile(latencies, 95)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pdf", required=True, help="text PDF to build the corpus from")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    texts, store, bm25 = build(args.pdf)
+    query_sets = make_queries(texts, bm25, args.queries, args.seed)
+    retrievers = {
+        "dense": store.as_retriever(search_kwargs={"k": args.k}),
+        "hybrid": HybridRetriever(vector_store=store, bm25=bm25, k=args.k),
+    }
+    print(f"{len(texts)} chunks from {args.pdf}")
+    print(f"{'queries':<10}{'retriever':<10}{'recall@' + str(args.k):>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for name, queries in query_sets.items():
+        for retriever_name, retriever in retrievers.items():
+            recall, p50, p95 = evaluate(retriever, queries)
+            print(f"{name:<10}{retriever_name:<10}{recall:>10.3f}{p50:>10.2f}{p95:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_question(question):
+    return re.sub(r"\s+", " ", question).strip().lower().rstrip("?!. ")
+
+
+class _FileAnswers:
+    """Answers for one index: a matrix of unit question vectors and one entry per row."""
+
+    def __init__(self):
+        self.vectors = None
+        self.entries = []
+
+    def add(self, vector, entry):
+        row = vector[None, :]
+        self.vectors = row if self.vectors is None else np.vstack([self.vectors, row])
+        self.entries.append(entry)
+
+    def remove(self, position):
+        self.vectors = np.delete(self.vectors, position, axis=0)
+        del self.entries[position]
+        if not self.entries:
+            self.vectors = None
+
+
+class AnswerCache:
+    """Semantic cache of first-turn answers, one namespace per canonical file_id.
+
+    A question hits when its normalized text was answered before, or when
+    its embedding has cosine similarity >= ``threshold`` with a cached
+    question. Entries expire after ``ttl_seconds``; beyond ``max_per_file``
+    or ``max_entries`` the least recently used answer is evicted. Index
+    changes must call ``invalidate`` since the stored answers and sources
+    describe the old chunks.
+    """
+
+    def __init__(self, threshold=0.92, max_entries=20000, max_per_file=500, ttl_seconds=7 * 24 * 3600):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.max_per_file = max_per_file
+        self.ttl_seconds = ttl_seconds
+        self._files = OrderedDict()  # file_id -> _FileAnswers, least recently used first
+        self._count = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _unit(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _expired(self, entry, now):
+        return bool(self.ttl_seconds) and now - entry["created_at"] > self.ttl_seconds
+
+    def lookup_text(self, file_id, question):
+        """Exact (normalized) question match; saves embedding the question on repeats."""
+        key = normalize_question(question)
+        with self._lock:
+            answers = self._files.get(file_id)
+            if answers is not None:
+                for entry in answers.entries:
+                    if entry["key"] == key and not self._expired(entry, time.time()):
+                        return self._hit(file_id, entry, 1.0)
+        return None
+
+    def lookup(self, file_id, vector):
+        """Best cached answer for a question embedding, or ``None`` (counted as a miss)."""
+        vector = self._unit(vector)
+        now = time.time()
+        with self._lock:
+            answers = self._files.get(file_id)
+            if answers is not None:
+                for position in reversed(range(len(answers.entries))):
+                    if self._expired(answers.entries[position], now):
+                        answers.remove(position)
+                        self._count -= 1
+            if answers is not None and answers.entries:
+                scores = answers.vectors @ vector
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    return self._hit(file_id, answers.entries[best], float(scores[best]))
+            self.misses += 1
+        return None
+
+    def _hit(self, file_id, entry, similarity):
+        self.hits += 1
+        entry["hits"] += 1
+        entry["last_used"] = time.monotonic()
+        self._files.move_to_end(file_id)
+        return {
+            "question": entry["question"],
+            "answer": entry["answer"],
+            "sources": entry["sources"],
+            "similarity": round(similarity, 4),
+        }
+
+    def put(self, file_id, question, vector, answer, sources):
+        entry = {
+            "key": normalize_question(question),
+            "question": question,
+            "answer": answer,
+            "sources": sources,
+            "created_at": time.time(),
+            "last_used": time.monotonic(),
+            "hits": 0,
+        }
+        with self._lock:
+            answers = self._files.get(file_id)
+            if answers is None:
+                answers = self._files[file_id] = _FileAnswers()
+            answers.add(self._unit(vector), entry)
+            self._files.move_to_end(file_id)
+            self._count += 1
+            if len(answers.entries) > self.max_per_file:
+                self._evict_from(file_id)
+            while self._count > self.max_entries:
+                self._evict_from(next(iter(self._files)))
+
+    def _evict_from(self, file_id):
+        answers = self._files[file_id]
+        position = min(range(len(answers.entries)), key=lambda i: answers.entries[i]["last_used"])
+        answers.remove(position)
+        self._count -= 1
+        self.evictions += 1
+        if not answers.entries:
+            del self._files[file_id]
+
+    def invalidate(self, file_id):
+        with self._lock:
+            answers = self._files.pop(file_id, None)
+            if answers is not None:
+                self._count -= len(answers.entries)
+                self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "files": len(self._files),
+                "entries": self._count,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "threshold": self.threshold,
+            }
+
+
+def get_answer_cache():
+    """``ANSWER_CACHE_THRESHOLD`` (cosine, default 0.92), ``ANSWER_CACHE_MAX_ENTRIES``,
+    ``ANSWER_CACHE_MAX_PER_FILE`` and ``ANSWER_CACHE_TTL`` (seconds); set
+    ``ANSWER_CACHE_MAX_ENTRIES=0`` to disable the cache."""
+    max_entries = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "20000"))
+    if max_entries <= 0:
+        return None
+    return AnswerCache(
+        threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.92")),
+        max_entries=max_entries,
+        max_per_file=int(os.getenv("ANSWER_CACHE_MAX_PER_FILE", "500")),
+        ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL", str(7 * 24 * 3600))),
+    )
@@ -0,0 +1,201 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from services.dedup import hash_text
+
+logger = logging.getLogger(__name__)
+
+# Enforce the disk budget every this many writes
+_PRUNE_EVERY = 64
+
+
+def artifact_key(kind, version, model, content):
+    """Content address of an LLM artifact: what it is, which prompt and model made it, from what input."""
+    if not isinstance(content, str):
+        content = json.dumps(content, sort_keys=True, ensure_ascii=False)
+    payload = f"{kind}\0{version}\0{model}\0{hash_text(content)}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ArtifactCache:
+    """Content-addressed cache for generated summaries, flashcards, MCQs, plans, units...
+
+    Values are JSON-serializable. Recent ones stay in an in-process LRU
+    bounded by entry count and bytes; with ``path`` they are also written to
+    SQLite (WAL mode, shared by uvicorn workers and the Streamlit app) with
+    the least recently used rows pruned beyond ``max_disk_bytes``. Every
+    entry can carry a TTL; ``ttl_seconds`` is the default (0 = never expires).
+    """
+
+    def __init__(self, path=None, max_memory_entries=1024, max_memory_bytes=64 * 1024 * 1024,
+                 max_disk_bytes=512 * 1024 * 1024, ttl_seconds=0):
+        self.path = path
+        self.max_memory_entries = max_memory_entries
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl_seconds = ttl_seconds
+        self._memory = OrderedDict()  # key -> (value, size, expires_at)
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._writes = 0
+        self._stats = {}
+        self._conn = None
+        if path:
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS artifacts (key TEXT PRIMARY KEY, kind TEXT NOT NULL, value TEXT NOT NULL, "
+                "size INTEGER NOT NULL, expires_at REAL, last_access REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS artifacts_last_access ON artifacts (last_access)")
+            self._conn.commit()
+
+    def _count(self, kind, field):
+        counters = self._stats.setdefault(kind, {"hits": 0, "misses": 0, "writes": 0})
+        counters[field] += 1
+
+    def lock(self, key):
+        """Per-key lock so only one caller in this process generates a given artifact."""
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def get(self, key, kind="artifact", count=True):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[2] and entry[2] < now:
+                self._forget(key)
+                entry = None
+            if entry is None and self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT value, expires_at FROM artifacts WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and (not row[1] or row[1] >= now):
+                    self._conn.execute("UPDATE artifacts SET last_access = ? WHERE key = ?", (now, key))
+                    self._conn.commit()
+                    entry = (json.loads(row[0]), len(row[0]), row[1])
+                    self._remember(key, *entry)
+            if entry is None:
+                if count:
+                    self._count(kind, "misses")
+                return None
+            self._memory.move_to_end(key)
+            if count:
+                self._count(kind, "hits")
+            return entry[0]
+
+    def put(self, key, value, kind="artifact", ttl=None):
+        ttl = self.ttl_seconds if ttl is None else ttl
+        expires_at = time.time() + ttl if ttl else None
+        encoded = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._remember(key, value, len(encoded), expires_at)
+            self._count(kind, "writes")
+            self._key_locks.pop(key, None)
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO artifacts (key, kind, value, size, expires_at, last_access) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, kind, encoded, len(encoded), expires_at, time.time()),
+                )
+                self._conn.commit()
+                self._writes += 1
+                if self._writes % _PRUNE_EVERY == 0:
+                    self._prune_disk()
+
+    def get_or_create(self, kind, version, model, content, create, ttl=None):
+        """Cached ``create()`` for this (kind, version, model, content); generated once per process at a time."""
+        key = artifact_key(kind, version, model, content)
+        value = self.get(key, kind)
+        if value is not None:
+            return value
+        with self.lock(key):
+            value = self.get(key, kind, count=False)
+            if value is None:
+                value = create()
+                self.put(key, value, kind, ttl)
+        return value
+
+    def _remember(self, key, value, size, expires_at):
+        self._forget(key)
+        self._memory[key] = (value, size, expires_at)
+        self._memory_bytes += size
+        while self._memory and (
+            len(self._memory) > self.max_memory_entries or self._memory_bytes > self.max_memory_bytes
+        ):
+            self._forget(next(iter(self._memory)))
+
+    def _forget(self, key):
+        entry = self._memory.pop(key, None)
+        if entry is not None:
+            self._memory_bytes -= entry[1]
+
+    def _prune_disk(self):
+        self._conn.execute("DELETE FROM artifacts WHERE expires_at IS NOT NULL AND expires_at < ?", (time.time(),))
+        (total,) = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM artifacts").fetchone()
+        if self.max_disk_bytes and total > self.max_disk_bytes:
+            excess = total - int(self.max_disk_bytes * 0.9)
+            rows = self._conn.execute("SELECT key, size FROM artifacts ORDER BY last_access").fetchall()
+            stale = []
+            for key, size in rows:
+                if excess <= 0:
+                    break
+                stale.append((key,))
+                excess -= size
+            self._conn.executemany("DELETE FROM artifacts WHERE key = ?", stale)
+            logger.info(f"Pruned {len(stale)} artifacts over the {self.max_disk_bytes} byte budget")
+        self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            by_kind = {}
+            for kind, counters in self._stats.items():
+                lookups = counters["hits"] + counters["misses"]
+                by_kind[kind] = dict(counters, hit_rate=round(counters["hits"] / lookups, 4) if lookups else 0.0)
+            disk = None
+            if self._conn is not None:
+                entries, size = self._conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM artifacts"
+                ).fetchone()
+                disk = {"entries": entries, "bytes": size}
+            return {
+                "memory": {"entries": len(self._memory), "bytes": self._memory_bytes},
+                "disk": disk,
+                "kinds": by_kind,
+            }
+
+
+_ARTIFACT_CACHE = None
+_ARTIFACT_CACHE_LOCK = threading.Lock()
+
+
+def get_artifact_cache():
+    """Process-wide cache configured by ``ARTIFACT_CACHE_PATH`` (default
+    ``artifact_cache.sqlite3``; empty keeps artifacts in memory only),
+    ``ARTIFACT_CACHE_MEMORY_ENTRIES``, ``ARTIFACT_CACHE_MEMORY_MB``,
+    ``ARTIFACT_CACHE_MAX_MB`` (disk) and ``ARTIFACT_CACHE_TTL`` (seconds)."""
+    global _ARTIFACT_CACHE
+    with _ARTIFACT_CACHE_LOCK:
+        if _ARTIFACT_CACHE is None:
+            options = dict(
+                max_memory_entries=int(os.getenv("ARTIFACT_CACHE_MEMORY_ENTRIES", "1024")),
+                max_memory_bytes=float(os.getenv("ARTIFACT_CACHE_MEMORY_MB", "64")) * 1024 * 1024,
+                max_disk_bytes=float(os.getenv("ARTIFACT_CACHE_MAX_MB", "512")) * 1024 * 1024,
+                ttl_seconds=float(os.getenv("ARTIFACT_CACHE_TTL", "0")),
+            )
+            path = os.getenv("ARTIFACT_CACHE_PATH", "artifact_cache.sqlite3")
+            try:
+                _ARTIFACT_CACHE = ArtifactCache(path or None, **options)
+            except sqlite3.Error as e:
+                logger.error(f"Artifact cache kept in memory, could not open {path}: {e}")
+                _ARTIFACT_CACHE = ArtifactCache(None, **options)
+        return _ARTIFACT_CACHE
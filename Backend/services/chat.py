@@ -1,21 +1,64 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
-from PyPDF2 import PdfReader
-from langchain.text_splitter import CharacterTextSplitter
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from langchain.prompts import PromptTemplate
-from langchain.memory import ConversationBufferMemory
 from langchain.chains import ConversationalRetrievalChain
-from langchain_groq import ChatGroq
+from langchain.chains.conversational_retrieval.prompts import CONDENSE_QUESTION_PROMPT
 from langchain_community.vectorstores import FAISS
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain.schema import HumanMessage, AIMessage
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from dotenv import load_dotenv
+import asyncio
+import json
 import os
+import threading
+import time
 import uuid
+from typing import Optional
+import weakref
+import faiss
+import numpy as np
+from services.answer_cache import get_answer_cache
+from services.artifact_cache import get_artifact_cache
+from services.chat_memory import RollingSummaryMemory, format_lines
+from services.documents import DocumentText, SourceText
+from services.embeddings import get_embeddings
+from services.dedup import DedupRegistry, hash_bytes, hash_text
+from services.hybrid_retriever import BM25Index, HybridRetriever
+from services.index_factory import build_index, training_size
+from services.index_store import get_index_store
+from services.jobs import FAILED, JobFailed, get_job_manager
+from services.llm_gateway import INTERACTIVE, chat_model, get_gateway
+from services.pdf_extract import extract_pages, join_pages
+from services.sessions import get_session_store
+from services.text_splitter import split_pages
+from services.tokens import count_tokens
+from services.vector_cache import VectorStoreEvicted, get_vectorstore_cache
 
 load_dotenv()
 
 router = APIRouter()
-VECTORSTORE_CACHE = {}
+INDEX_STORE = get_index_store()
+DEDUP_REGISTRY = DedupRegistry(
+    os.path.join(INDEX_STORE.root, "dedup.json") if INDEX_STORE is not None else None
+)
+JOB_MANAGER = get_job_manager()
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+# bytes hash -> {"job", "uploads"} for PDFs still being ingested, so concurrent
+# duplicates attach to the running job instead of starting another one;
+# "uploads" counts them so each gets its own reference on the result
+_PENDING_UPLOADS = {}
+_PENDING_LOCK = threading.Lock()
+# serializes append/remove jobs on the same index
+_MUTATION_LOCKS = {}
+# callbacks(file_id) run whenever an index is (re)built, to refresh derived caches
+INDEX_LISTENERS = []
+# vector store -> DocumentText, dropped together with evicted stores
+_DOCUMENTS = weakref.WeakKeyDictionary()
+# vector store -> BM25Index; entries disappear together with evicted stores
+_BM25_INDEXES = weakref.WeakKeyDictionary()
+SESSION_STORE = get_session_store()
+ANSWER_CACHE = get_answer_cache()
+SESSION_PRUNE_INTERVAL = 300
+_last_session_prune = 0.0
 
 CUSTOM_PROMPT = PromptTemplate(
     input_variables=["context", "question", "chat_history"],
@@ -39,94 +82,515 @@ Answer:
 
 import logging
 
-def get_pdf_text(pdf_file):
-    text = ""
-    try:
-        pdf_reader = PdfReader(pdf_file)
-        for page_num, page in enumerate(pdf_reader.pages):
-            try:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n"
-                logging.info(f"Page {page_num+1} extracted length: {len(page_text) if page_text else 0}")
-            except Exception as e:
-                logging.error(f"Error extracting text from page {page_num+1}: {e}")
-                continue
-    except Exception as e:
-        logging.error(f"PDF extraction error: {e}")
-        return ""
-    logging.info(f"Total extracted text length: {len(text.strip())}")
-    logging.info(f"Sample extracted text: {text[:200]}")
-    return text.strip()
-
-def get_text_chunks(raw_text):
-    text_splitter = CharacterTextSplitter(
-        separator="\n",
-        chunk_size=1000,
-        chunk_overlap=200,
-        length_function=len
-    )
-    return text_splitter.split_text(raw_text)
+def _add_vectors(store, texts, metadatas, start, vectors):
+    """Add the float32 rows ``vectors`` for ``texts[start:]`` to ``store``, a batch at a time."""
+    for offset in range(0, len(vectors), EMBED_BATCH_SIZE):
+        rows = vectors[offset:offset + EMBED_BATCH_SIZE]
+        first = start + offset
+        store.add_embeddings(
+            list(zip(texts[first:first + len(rows)], rows)),
+            metadatas=metadatas[first:first + len(rows)]
+        )
 
-def get_vectorstore(text_chunks):
-    embedding = HuggingFaceEmbeddings(
-        model_name="BAAI/bge-m3",
-        model_kwargs={"device": "cpu"},
-        encode_kwargs={"normalize_embeddings": True}
-    )
-    store = FAISS.from_texts(text_chunks, embedding=embedding)
+def get_vectorstore(text_chunks, metadatas=None, on_progress=None, store=None):
+    """Embed ``text_chunks`` and build a FAISS store, adding vectors as batches arrive.
+
+    The index type (flat / HNSW / IVF-PQ) is chosen from the chunk count by
+    ``services.index_factory``. Pass ``store`` to append to an existing index
+    instead of creating one. ``on_progress(chunks_embedded)`` is called after
+    every batch.
+    """
+    embedding = get_embeddings()
+    metadatas = metadatas or [{} for _ in text_chunks]
+    # IVF-PQ must be trained before anything is added: the first vectors wait in
+    # a preallocated float32 array (not lists of Python floats) until there are enough
+    training = None
+    done = 0
+    for vectors in embedding.iter_embed_documents(text_chunks, batch_size=EMBED_BATCH_SIZE):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if store is None:
+            store = FAISS(
+                embedding_function=embedding,
+                index=build_index(vectors.shape[1], len(text_chunks)),
+                docstore=InMemoryDocstore(),
+                index_to_docstore_id={},
+            )
+        start = done
+        done += len(vectors)
+        train_size = training_size(store.index, len(text_chunks))
+        if train_size:
+            if training is None:
+                training = np.empty((train_size, vectors.shape[1]), dtype=np.float32)
+            take = min(len(vectors), train_size - start)
+            training[start:start + take] = vectors[:take]
+            if done >= train_size:
+                store.index.train(training)
+                _add_vectors(store, text_chunks, metadatas, 0, training)
+                training = None
+            start, vectors = start + take, vectors[take:]
+        _add_vectors(store, text_chunks, metadatas, start, vectors)
+        if on_progress:
+            on_progress(done)
     if not isinstance(store, FAISS):
         raise TypeError(f"Expected FAISS object, got {type(store)}")
     return store
 
-def get_conversation_chain(vector_store):
-    if not isinstance(vector_store, FAISS):
-        raise TypeError(f"Expected FAISS object, got {type(vector_store)}")
-    llm = ChatGroq(
-        model="llama3-8b-8192",
-        api_key=os.getenv("GROQ_API_KEY")
+def _load_from_store(file_id):
+    if not INDEX_STORE.exists(file_id):
+        return None
+    return INDEX_STORE.load(file_id, get_embeddings())
+
+def _store_attachments(vector_store):
+    """Per-store structures held next to a cached store, counted in its footprint."""
+    return [x for x in (_DOCUMENTS.get(vector_store), _BM25_INDEXES.get(vector_store)) if x is not None]
+
+VECTORSTORE_CACHE = get_vectorstore_cache(
+    loader=_load_from_store if INDEX_STORE is not None else None,
+    refcount=DEDUP_REGISTRY.refcount,
+    attachments=_store_attachments
+)
+
+def save_vectorstore(file_id, vector_store, document=None):
+    """Publish ``vector_store`` (and its canonical ``DocumentText``) as ``file_id``."""
+    if document is not None:
+        _DOCUMENTS[vector_store] = document
+    VECTORSTORE_CACHE.put(file_id, vector_store)
+    if INDEX_STORE is not None:
+        INDEX_STORE.save(file_id, vector_store)
+        if document is not None:
+            INDEX_STORE.save_artifact(file_id, "document", document)
+    for listener in INDEX_LISTENERS:
+        try:
+            listener(file_id)
+        except Exception as e:
+            logging.error(f"Index listener {listener.__name__} failed for {file_id}: {e}")
+
+def on_index_changed(listener):
+    """Register ``listener(file_id)`` to run after an index is built or modified."""
+    INDEX_LISTENERS.append(listener)
+    return listener
+
+def copy_vectorstore(vector_store, file_id=None):
+    """Independent copy that can be modified while readers keep using the original.
+
+    A persisted ``file_id`` is re-read from disk fully into memory, since a
+    memory-mapped index may not support cloning.
+    """
+    if file_id and INDEX_STORE is not None and INDEX_STORE.exists(file_id):
+        return INDEX_STORE.load(file_id, get_embeddings(), writable=True)
+    return FAISS(
+        embedding_function=get_embeddings(),
+        index=faiss.clone_index(vector_store.index),
+        docstore=InMemoryDocstore(dict(vector_store.docstore._dict)),
+        index_to_docstore_id=dict(vector_store.index_to_docstore_id),
     )
-    memory = ConversationBufferMemory(
-        memory_key="chat_history",
+
+def ordered_documents(vector_store):
+    """Documents in index order."""
+    mapping = vector_store.index_to_docstore_id
+    return [vector_store.docstore.search(mapping[i]) for i in range(len(mapping))]
+
+def document_sources(vector_store):
+    sources = {}
+    for doc in ordered_documents(vector_store):
+        source_id = doc.metadata.get("source")
+        entry = sources.setdefault(source_id, {"source_id": source_id, "name": doc.metadata.get("source_name"), "chunks": 0})
+        entry["chunks"] += 1
+    return list(sources.values())
+
+def _document_for(vector_store, file_id=None):
+    document = _DOCUMENTS.get(vector_store)
+    if document is None and file_id and INDEX_STORE is not None:
+        document = INDEX_STORE.load_artifact(file_id, "document")
+    if document is None:
+        logging.info(f"No canonical text stored for {file_id}, rebuilding it from chunks")
+        document = DocumentText.from_chunks(ordered_documents(vector_store))
+        if file_id and INDEX_STORE is not None:
+            INDEX_STORE.save_artifact(file_id, "document", document)
+    if _DOCUMENTS.get(vector_store) is not document:
+        _DOCUMENTS[vector_store] = document
+        VECTORSTORE_CACHE.resize(vector_store)
+    return document
+
+def get_document(file_id):
+    """Canonical ``DocumentText`` for ``file_id``, or ``None`` if there is no such index.
+
+    Raises the same ``HTTPException``s as ``load_vectorstore``.
+    """
+    vector_store = load_vectorstore(file_id)
+    if vector_store is None:
+        return None
+    return _document_for(vector_store, DEDUP_REGISTRY.resolve(file_id))
+
+def load_vectorstore(file_id):
+    """Return the FAISS store for ``file_id``, loading it from disk on first use.
+
+    Raises ``HTTPException(202)`` while the upload is still being ingested,
+    ``HTTPException(422)`` if ingestion failed, and ``HTTPException(410)`` when
+    the store was evicted from memory and there is no persistent copy to
+    reload it from.
+    """
+    try:
+        vector_store = VECTORSTORE_CACHE.get(DEDUP_REGISTRY.resolve(file_id))
+    except VectorStoreEvicted:
+        raise HTTPException(
+            status_code=410,
+            detail="This document was evicted from the server cache. Please upload the PDF again."
+        )
+    if vector_store is None:
+        job = JOB_MANAGER.for_file(file_id)
+        if job is not None and job.stage == FAILED:
+            raise HTTPException(status_code=422, detail=job.error)
+        if job is not None and not job.finished:
+            raise HTTPException(
+                status_code=202,
+                detail={"message": "PDF is still being processed.", **job.to_dict()}
+            )
+    return vector_store
+
+def _reuse_duplicate(file_id):
+    """Take a reference on an already-indexed duplicate, if it is still loadable."""
+    if file_id is None:
+        return None
+    try:
+        available = VECTORSTORE_CACHE.get(file_id) is not None
+    except VectorStoreEvicted:
+        available = False
+    if not available:
+        DEDUP_REGISTRY.forget(file_id)
+        return None
+    DEDUP_REGISTRY.acquire(file_id)
+    return file_id
+
+def get_bm25(vector_store, file_id=None):
+    """BM25 index for ``vector_store``: from memory, from the index store, or built now."""
+    bm25 = _BM25_INDEXES.get(vector_store)
+    if bm25 is None and file_id and INDEX_STORE is not None:
+        bm25 = INDEX_STORE.load_artifact(file_id, "bm25")
+    if bm25 is None or len(bm25) != len(vector_store.index_to_docstore_id):
+        mapping = vector_store.index_to_docstore_id
+        doc_ids = [mapping[i] for i in range(len(mapping))]
+        bm25 = BM25Index(doc_ids, [vector_store.docstore.search(doc_id).page_content for doc_id in doc_ids])
+        if file_id and INDEX_STORE is not None:
+            INDEX_STORE.save_artifact(file_id, "bm25", bm25)
+    if _BM25_INDEXES.get(vector_store) is not bm25:
+        _BM25_INDEXES[vector_store] = bm25
+        VECTORSTORE_CACHE.resize(vector_store)
+    return bm25
+
+@on_index_changed
+def _build_bm25(file_id):
+    get_bm25(VECTORSTORE_CACHE.get(file_id), file_id)
+
+def get_chat_llm():
+    """The gateway's chat model, scheduled ahead of summarization and other batch work."""
+    return chat_model("llama3-8b-8192", priority=INTERACTIVE)
+
+def session_memory(state=None):
+    """Token-capped chat memory restored from a stored session."""
+    return RollingSummaryMemory.from_state(
+        get_chat_llm(),
+        state,
         return_messages=True,
         output_key="answer"
     )
+
+def prompt_usage(history_text, response):
+    """Token counts of the answer prompt sent to Groq for one chat turn."""
+    context = "\n\n".join(doc.page_content for doc in response.get("source_documents", []))
+    question = response.get("generated_question") or response["question"]
+    return {
+        "prompt_tokens": count_tokens(CUSTOM_PROMPT.format(context=context, question=question, chat_history=history_text)),
+        "history_tokens": count_tokens(history_text),
+        "context_tokens": count_tokens(context),
+    }
+
+def source_metadata(docs):
+    keys = ("source", "source_name", "chunk_index", "page_start", "page_end", "heading")
+    return [{key: doc.metadata.get(key) for key in keys if key in doc.metadata} for doc in docs]
+
+def is_first_turn(memory):
+    return not memory.chat_memory.messages and not memory.summary
+
+def cached_answer(cache_id, question):
+    """``(hit, question_vector)`` for a first-turn question; on a miss the
+    vector is kept so the fresh answer can be cached without re-embedding."""
+    if ANSWER_CACHE is None:
+        return None, None
+    hit = ANSWER_CACHE.lookup_text(cache_id, question)
+    if hit is not None:
+        return hit, None
+    vector = get_embeddings().embed_query(question)
+    return ANSWER_CACHE.lookup(cache_id, vector), vector
+
+def remember_answer(cache_id, question, vector, answer, sources):
+    if ANSWER_CACHE is None or not answer.strip():
+        return
+    if vector is None:
+        vector = get_embeddings().embed_query(question)
+    ANSWER_CACHE.put(cache_id, question, vector, answer, sources)
+
+@on_index_changed
+def _invalidate_answers(file_id):
+    if ANSWER_CACHE is not None:
+        ANSWER_CACHE.invalidate(file_id)
+
+def _prune_sessions():
+    global _last_session_prune
+    now = time.monotonic()
+    if now - _last_session_prune < SESSION_PRUNE_INTERVAL:
+        return
+    _last_session_prune = now
+    try:
+        SESSION_STORE.prune()
+    except Exception as e:
+        logging.error(f"Session prune failed: {e}")
+
+def get_conversation_chain(vector_store, file_id=None, memory=None):
+    if not isinstance(vector_store, FAISS):
+        raise TypeError(f"Expected FAISS object, got {type(vector_store)}")
     return ConversationalRetrievalChain.from_llm(
-        llm=llm,
-        retriever=vector_store.as_retriever(),
-        memory=memory,
+        llm=get_chat_llm(),
+        retriever=HybridRetriever(vector_store=vector_store, bm25=get_bm25(vector_store, file_id)),
+        memory=memory or session_memory(),
         return_source_documents=True,
+        return_generated_question=True,
         output_key="answer",
         combine_docs_chain_kwargs={"prompt": CUSTOM_PROMPT}
     )
 
+def _extract(job, pdf_bytes):
+    job.set_stage("extracting")
+    try:
+        pages = extract_pages(
+            pdf_bytes,
+            on_progress=lambda done, total: job.update(pages_processed=done, pages_total=total)
+        )
+    except Exception as e:
+        logging.error(f"PDF extraction error: {e}")
+        raise JobFailed("Could not read the PDF.")
+    raw_text = join_pages(pages)
+    logging.info(f"Raw text length after extraction: {len(raw_text)}")
+    if not raw_text.strip():
+        raise JobFailed("No text found in PDF.")
+    return pages, raw_text
+
+def _chunk(job, pages, source_id, source_name):
+    job.set_stage("chunking")
+    chunks = list(split_pages(pages))
+    for chunk in chunks:
+        chunk.metadata["source"] = source_id
+        chunk.metadata["source_name"] = source_name
+    logging.info(f"Number of text chunks: {len(chunks)}")
+    job.update(chunks_total=len(chunks))
+    return chunks
+
+def _embed(job, chunks, store=None):
+    job.set_stage("embedding")
+    return get_vectorstore(
+        [chunk.text for chunk in chunks],
+        metadatas=[chunk.metadata for chunk in chunks],
+        on_progress=lambda n: job.update(chunks_embedded=n),
+        store=store
+    )
+
+def _claim_uploads(job, bytes_hash):
+    """Stop attaching new uploads to ``job``; returns how many uploads share its result."""
+    with _PENDING_LOCK:
+        pending = _PENDING_UPLOADS.get(bytes_hash)
+        if pending is None or pending["job"] is not job:
+            return 1
+        del _PENDING_UPLOADS[bytes_hash]
+        return pending["uploads"]
+
+def _ingest_pdf(job, file_id, pdf_bytes, bytes_hash, source_name=None):
+    """Background pipeline: extract -> dedup by text -> chunk -> embed -> index.
+
+    Every upload that attached to this job gets its own reference on the
+    resulting file_id, so a later append by one of them forks the index.
+    """
+    try:
+        pages, raw_text = _extract(job, pdf_bytes)
+
+        text_hash = hash_text(raw_text)
+        canonical_id = _reuse_duplicate(DEDUP_REGISTRY.lookup_text(text_hash))
+        if canonical_id:
+            logging.info(f"Upload {file_id} matches already indexed file {canonical_id} (text hash)")
+            DEDUP_REGISTRY.register(canonical_id, bytes_hash=bytes_hash)
+            DEDUP_REGISTRY.alias(file_id, canonical_id)
+            # _reuse_duplicate already took the first upload's reference
+            DEDUP_REGISTRY.acquire(canonical_id, _claim_uploads(job, bytes_hash) - 1)
+            return {"file_id": canonical_id, "deduplicated": True}
+
+        chunks = _chunk(job, pages, bytes_hash, source_name)
+        vector_store = _embed(job, chunks)
+
+        job.set_stage("indexing")
+        document = DocumentText([SourceText.from_pages(bytes_hash, source_name, pages)])
+        save_vectorstore(file_id, vector_store, document)
+        DEDUP_REGISTRY.register(file_id, bytes_hash=bytes_hash, text_hash=text_hash)
+        DEDUP_REGISTRY.acquire(file_id, _claim_uploads(job, bytes_hash))
+        return {"file_id": file_id, "deduplicated": False}
+    finally:
+        _claim_uploads(job, bytes_hash)
+
+def _mutation_lock(file_id):
+    with _PENDING_LOCK:
+        return _MUTATION_LOCKS.setdefault(file_id, threading.Lock())
+
+def _load_for_update(file_id):
+    try:
+        vector_store = load_vectorstore(file_id)
+    except HTTPException as e:
+        raise JobFailed(str(e.detail))
+    if vector_store is None:
+        raise JobFailed("Invalid file_id. Please upload the PDF again.")
+    return vector_store
+
+def _writable_file_id(file_id):
+    """Return ``(base_id, target_id)`` for a modification of ``file_id``.
+
+    An index shared by several uploads (see dedup) is never modified in
+    place: the modified copy goes to a fresh file_id and everyone else
+    keeps the original.
+    """
+    base_id = DEDUP_REGISTRY.resolve(file_id)
+    if DEDUP_REGISTRY.refcount(base_id) > 1:
+        return base_id, str(uuid.uuid4())
+    return base_id, base_id
+
+def _commit_update(base_id, target_id):
+    if target_id != base_id:
+        # the caller's reference moves to the fork
+        DEDUP_REGISTRY.release(base_id)
+        DEDUP_REGISTRY.acquire(target_id)
+    else:
+        # content changed, so uploads of the original PDF must no longer match it
+        DEDUP_REGISTRY.unregister(base_id)
+
+def _append_pdf(job, base_id, target_id, pdf_bytes, bytes_hash, source_name=None):
+    """Embed only the new PDF's chunks and add them to a copy of the existing index."""
+    with _mutation_lock(base_id):
+        base_store = _load_for_update(base_id)
+        if any(source["source_id"] == bytes_hash for source in document_sources(base_store)):
+            raise JobFailed("This PDF is already part of the document.")
+        pages, _ = _extract(job, pdf_bytes)
+        chunks = _chunk(job, pages, bytes_hash, source_name)
+        vector_store = _embed(job, chunks, store=copy_vectorstore(base_store, base_id))
+        job.set_stage("indexing")
+        document = _document_for(base_store, base_id).with_source(
+            SourceText.from_pages(bytes_hash, source_name, pages)
+        )
+        save_vectorstore(target_id, vector_store, document)
+        _commit_update(base_id, target_id)
+    return {"file_id": target_id, "forked": target_id != base_id}
+
+def _remove_source(job, base_id, target_id, source_id):
+    """Rebuild the index without one source; the embedding cache makes this re-embed-free."""
+    with _mutation_lock(base_id):
+        base_store = _load_for_update(base_id)
+        documents = ordered_documents(base_store)
+        remaining = [doc for doc in documents if doc.metadata.get("source") != source_id]
+        if len(remaining) == len(documents):
+            raise JobFailed("No such source in this document.")
+        if not remaining:
+            raise JobFailed("Cannot remove the only source of a document.")
+        job.update(chunks_total=len(remaining))
+        job.set_stage("embedding")
+        vector_store = get_vectorstore(
+            [doc.page_content for doc in remaining],
+            metadatas=[doc.metadata for doc in remaining],
+            on_progress=lambda n: job.update(chunks_embedded=n)
+        )
+        job.set_stage("indexing")
+        save_vectorstore(target_id, vector_store, _document_for(base_store, base_id).without_source(source_id))
+        _commit_update(base_id, target_id)
+    return {"file_id": target_id, "forked": target_id != base_id}
+
 @router.post("/upload/")
 async def upload_pdf(pdf: UploadFile = File(...)):
     if pdf.content_type != "application/pdf":
         raise HTTPException(status_code=400, detail="Invalid file type. Please upload a PDF.")
 
-    raw_text = get_pdf_text(pdf.file)
-    logging.info(f"Raw text length after extraction: {len(raw_text)}")
-    if not raw_text:
-        raise HTTPException(status_code=400, detail="No text found in PDF.")
+    pdf_bytes = await pdf.read()
+    bytes_hash = hash_bytes(pdf_bytes)
+    # the duplicate may have to be reloaded from disk: keep that off the event loop
+    file_id = await asyncio.to_thread(_reuse_duplicate, DEDUP_REGISTRY.lookup_bytes(bytes_hash))
+    if file_id:
+        logging.info(f"Upload matches already indexed file {file_id} (byte hash)")
+        return {"file_id": file_id, "job_id": None, "status": "done",
+                "message": "PDF uploaded successfully", "deduplicated": True}
 
-    text_chunks = get_text_chunks(raw_text)
-    logging.info(f"Number of text chunks: {len(text_chunks)}")
-    if text_chunks:
-        logging.info(f"First chunk sample: {text_chunks[0][:200]}")
-    vector_store = get_vectorstore(text_chunks)
+    with _PENDING_LOCK:
+        pending = _PENDING_UPLOADS.get(bytes_hash)
+        if pending is None:
+            file_id = str(uuid.uuid4())
+            job = JOB_MANAGER.submit(file_id, _ingest_pdf, file_id, pdf_bytes, bytes_hash, pdf.filename)
+            pending = _PENDING_UPLOADS[bytes_hash] = {"job": job, "uploads": 0}
+        pending["uploads"] += 1
+        job = pending["job"]
 
-    file_id = str(uuid.uuid4())
-    VECTORSTORE_CACHE[file_id] = vector_store
+    return {"file_id": job.file_id, "job_id": job.id, "status": job.stage,
+            "message": "PDF received, processing started", "deduplicated": False}
 
-    return {"file_id": file_id, "message": "PDF uploaded successfully"}
+@router.post("/upload/append/")
+async def append_pdf(file_id: str = Form(...), pdf: UploadFile = File(...)):
+    if pdf.content_type != "application/pdf":
+        raise HTTPException(status_code=400, detail="Invalid file type. Please upload a PDF.")
+    # a cold cache reads the index from disk: keep that off the event loop
+    if await asyncio.to_thread(load_vectorstore, file_id) is None:
+        raise HTTPException(status_code=404, detail="Invalid file_id. Please upload the PDF again.")
 
-@router.post("/chat/")
-async def chat_with_book(user_question: str = Form(...), file_id: str = Form(...)):
-    if file_id not in VECTORSTORE_CACHE:
+    pdf_bytes = await pdf.read()
+    base_id, target_id = _writable_file_id(file_id)
+    job = JOB_MANAGER.submit(target_id, _append_pdf, base_id, target_id, pdf_bytes, hash_bytes(pdf_bytes), pdf.filename)
+    return {"file_id": target_id, "job_id": job.id, "status": job.stage,
+            "message": "PDF received, appending to document"}
+
+# Plain def (threadpool): loading the index and walking its chunks would stall the event loop
+@router.get("/documents/{file_id}/sources")
+def list_sources(file_id: str):
+    vector_store = load_vectorstore(file_id)
+    if vector_store is None:
+        raise HTTPException(status_code=404, detail="Invalid file_id. Please upload the PDF again.")
+    return {"file_id": file_id, "sources": document_sources(vector_store)}
+
+@router.get("/documents/{file_id}/text")
+async def document_text(file_id: str, source_id: Optional[str] = None,
+                        page_start: Optional[int] = None, page_end: Optional[int] = None):
+    # may load the index and rebuild/persist the canonical text
+    document = await asyncio.to_thread(get_document, file_id)
+    if document is None:
         raise HTTPException(status_code=404, detail="Invalid file_id. Please upload the PDF again.")
+    if source_id is None and page_start is None and page_end is None:
+        return {"file_id": file_id, "text": document.text, "sources": document.describe(),
+                "approximate": document.approximate}
+    source = document.source(source_id) if source_id else (document.sources[0] if len(document.sources) == 1 else None)
+    if source is None:
+        raise HTTPException(status_code=400, detail="Pick a source_id from /documents/{file_id}/sources.")
+    return {"file_id": file_id, "source_id": source.source_id,
+            "text": source.page_range(page_start, page_end), "approximate": document.approximate}
 
-    vector_store = VECTORSTORE_CACHE[file_id]
+@router.delete("/documents/{file_id}/sources/{source_id}")
+def remove_source(file_id: str, source_id: str):
+    if load_vectorstore(file_id) is None:
+        raise HTTPException(status_code=404, detail="Invalid file_id. Please upload the PDF again.")
+    base_id, target_id = _writable_file_id(file_id)
+    job = JOB_MANAGER.submit(target_id, _remove_source, base_id, target_id, source_id)
+    return {"file_id": target_id, "job_id": job.id, "status": job.stage,
+            "message": "Removing source from document"}
+
+@router.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    job = JOB_MANAGER.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job_id.")
+    return job.to_dict()
+
+def _chat_vectorstore(file_id):
+    vector_store = load_vectorstore(file_id)
+    if vector_store is None:
+        raise HTTPException(status_code=404, detail="Invalid file_id. Please upload the PDF again.")
 
     # Ensure we have a proper FAISS object
     if not isinstance(vector_store, FAISS):
@@ -134,19 +598,194 @@ async def chat_with_book(user_question: str = Form(...), file_id: str = Form(...
             status_code=500,
             detail=f"Vector store is corrupted. Expected FAISS object, got {type(vector_store)}. Please re-upload the PDF."
         )
+    return vector_store
 
+# Plain def: FastAPI runs it on the threadpool, so waiting on the session lock
+# (held by a streaming turn) or on Groq never blocks the event loop
+@router.post("/chat/")
+def chat_with_book(
+    user_question: str = Form(...),
+    file_id: str = Form(...),
+    session_id: Optional[str] = Form(None),
+):
+    vector_store = _chat_vectorstore(file_id)
+    _prune_sessions()
+    session_id = session_id or str(uuid.uuid4())
+    cache_id = DEDUP_REGISTRY.resolve(file_id)
     try:
-        conversation = get_conversation_chain(vector_store)
-        response = conversation({'question': user_question})
+        with SESSION_STORE.lock(file_id, session_id):
+            memory = session_memory(SESSION_STORE.load(file_id, session_id))
+            first_turn = is_first_turn(memory)
+            hit, question_vector = cached_answer(cache_id, user_question) if first_turn else (None, None)
+            if hit is not None:
+                memory.save_context({"question": user_question}, {"answer": hit["answer"]})
+                state = memory.to_state()
+                SESSION_STORE.save(file_id, session_id, state)
+                return {
+                    "answer": hit["answer"],
+                    "chat_history": state["messages"],
+                    "session_id": session_id,
+                    "sources": hit["sources"],
+                    "cached": {"question": hit["question"], "similarity": hit["similarity"]},
+                    "usage": {"prompt_tokens": 0, "summarized_turns": 0},
+                }
+            history_text = format_lines(memory.history_messages())
+            conversation = get_conversation_chain(vector_store, cache_id, memory)
+            response = conversation({'question': user_question})
+            state = memory.to_state()
+            SESSION_STORE.save(file_id, session_id, state)
         answer = response['answer']
+        sources = source_metadata(response["source_documents"])
+        if first_turn:
+            remember_answer(cache_id, user_question, question_vector, answer, sources)
+        usage = prompt_usage(history_text, response)
+        usage["summarized_turns"] = state["summarized_turns"]
+        logging.info(f"Chat turn for {file_id}/{session_id}: {usage}")
 
-        chat_history = []
-        for msg in response['chat_history']:
-            if isinstance(msg, HumanMessage):
-                chat_history.append({"role": "user", "content": msg.content})
-            elif isinstance(msg, AIMessage):
-                chat_history.append({"role": "assistant", "content": msg.content})
-
-        return {"answer": answer, "chat_history": chat_history}
+        return {
+            "answer": answer,
+            "chat_history": state["messages"],
+            "session_id": session_id,
+            "sources": sources,
+            "cached": None,
+            "usage": usage,
+        }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing chat: {str(e)}")
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _stream_turn(vector_store, file_id, session_id, user_question, emit, cancelled):
+    """Run one chat turn on a worker thread, reporting progress through ``emit(event, data)``.
+
+    Mirrors ConversationalRetrievalChain (condense the question against the
+    history, retrieve, answer) but streams the answer tokens, and stops
+    pulling from Groq as soon as ``cancelled`` is set.
+    """
+    started = time.perf_counter()
+    cache_id = DEDUP_REGISTRY.resolve(file_id)
+    with SESSION_STORE.lock(file_id, session_id):
+        memory = session_memory(SESSION_STORE.load(file_id, session_id))
+        first_turn = is_first_turn(memory)
+        hit, question_vector = cached_answer(cache_id, user_question) if first_turn else (None, None)
+        if hit is not None:
+            cached = {"question": hit["question"], "similarity": hit["similarity"]}
+            emit("sources", {"session_id": session_id, "sources": hit["sources"], "cached": cached})
+            emit("token", {"text": hit["answer"]})
+            memory.save_context({"question": user_question}, {"answer": hit["answer"]})
+            SESSION_STORE.save(file_id, session_id, memory.to_state())
+            total_ms = round((time.perf_counter() - started) * 1000, 1)
+            emit("done", {"session_id": session_id, "cached": cached,
+                          "usage": {"prompt_tokens": 0, "first_token_ms": total_ms, "total_ms": total_ms}})
+            return
+        history_text = format_lines(memory.history_messages())
+        llm = get_chat_llm()
+        question = user_question
+        if not first_turn:
+            question = llm.invoke(
+                CONDENSE_QUESTION_PROMPT.format(chat_history=history_text, question=user_question)
+            ).content.strip()
+        retriever = HybridRetriever(vector_store=vector_store, bm25=get_bm25(vector_store, cache_id))
+        docs = retriever.invoke(question)
+        sources = source_metadata(docs)
+        emit("sources", {"session_id": session_id, "sources": sources, "cached": None})
+
+        prompt = CUSTOM_PROMPT.format(
+            context="\n\n".join(doc.page_content for doc in docs),
+            question=question,
+            chat_history=history_text,
+        )
+        parts = []
+        first_token_ms = None
+        for chunk in llm.stream(prompt):
+            if cancelled.is_set():
+                logging.info(f"Client left {file_id}/{session_id}, stopped after {len(parts)} chunks")
+                return
+            if not chunk.content:
+                continue
+            if first_token_ms is None:
+                first_token_ms = (time.perf_counter() - started) * 1000
+            parts.append(chunk.content)
+            emit("token", {"text": chunk.content})
+
+        answer = "".join(parts)
+        memory.save_context({"question": user_question}, {"answer": answer})
+        state = memory.to_state()
+        SESSION_STORE.save(file_id, session_id, state)
+    if first_turn:
+        remember_answer(cache_id, user_question, question_vector, answer, sources)
+
+    usage = prompt_usage(history_text, {"source_documents": docs, "generated_question": question})
+    usage["summarized_turns"] = state["summarized_turns"]
+    usage["first_token_ms"] = round(first_token_ms or 0.0, 1)
+    usage["total_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    logging.info(f"Streamed chat turn for {file_id}/{session_id}: {usage}")
+    emit("done", {"session_id": session_id, "cached": None, "usage": usage})
+
+@router.post("/chat/stream/")
+async def chat_stream(
+    request: Request,
+    user_question: str = Form(...),
+    file_id: str = Form(...),
+    session_id: Optional[str] = Form(None),
+):
+    """Server-sent events: ``sources`` first, then ``token`` events, then ``done`` (or ``error``)."""
+    vector_store = await asyncio.to_thread(_chat_vectorstore, file_id)
+    await asyncio.to_thread(_prune_sessions)
+    session_id = session_id or str(uuid.uuid4())
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    cancelled = threading.Event()
+
+    def emit(event, data):
+        loop.call_soon_threadsafe(queue.put_nowait, (event, data))
+
+    def run():
+        try:
+            _stream_turn(vector_store, file_id, session_id, user_question, emit, cancelled)
+        except Exception as e:
+            logging.error(f"Streaming chat failed for {file_id}: {e}")
+            emit("error", {"detail": f"Error processing chat: {str(e)}"})
+        finally:
+            emit(None, None)
+
+    async def events():
+        loop.run_in_executor(None, run)
+        try:
+            while True:
+                event, data = await queue.get()
+                if event is None:
+                    break
+                if await request.is_disconnected():
+                    break
+                yield _sse(event, data)
+        finally:
+            # Also reached when Starlette cancels the generator on disconnect;
+            # the worker sees the flag at its next token and closes the Groq stream.
+            cancelled.set()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.delete("/chat/{file_id}/sessions/{session_id}")
+async def end_session(file_id: str, session_id: str):
+    if not SESSION_STORE.delete(file_id, session_id):
+        raise HTTPException(status_code=404, detail="Unknown session.")
+    return {"file_id": file_id, "session_id": session_id, "status": "deleted"}
+
+@router.get("/cache/stats")
+async def cache_stats():
+    embedding_cache = get_embeddings().cache
+    return {
+        "vectorstores": VECTORSTORE_CACHE.stats(),
+        "dedup": DEDUP_REGISTRY.stats(),
+        "embeddings": embedding_cache.stats() if embedding_cache is not None else None,
+        "sessions": SESSION_STORE.stats(),
+        "answers": ANSWER_CACHE.stats() if ANSWER_CACHE is not None else None,
+        "artifacts": get_artifact_cache().stats(),
+        "llm_requests": get_gateway().inflight.stats(),
+    }
@@ -0,0 +1,135 @@
+import logging
+import os
+from typing import Any, Dict, List
+
+from langchain.memory.chat_memory import BaseChatMemory
+from langchain.prompts import PromptTemplate
+from langchain.schema import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+from services.tokens import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# Turns (question + answer) replayed verbatim into the prompt
+CHAT_HISTORY_TURNS = int(os.getenv("CHAT_HISTORY_TURNS", "4"))
+# Token budget for summary + verbatim turns; llama3-8b has 8192 for everything
+CHAT_HISTORY_MAX_TOKENS = int(os.getenv("CHAT_HISTORY_MAX_TOKENS", "1500"))
+
+SUMMARY_PROMPT = PromptTemplate(
+    input_variables=["summary", "new_lines", "max_words"],
+    template="""
+Progressively summarize a conversation between a student and a study assistant about the student's notes.
+Extend the current summary with the new lines, keeping facts, definitions and open questions the student
+may refer back to. Keep it under {max_words} words.
+
+Current summary:
+{summary}
+
+New lines of conversation:
+{new_lines}
+
+New summary:
+"""
+)
+
+
+def format_lines(messages):
+    lines = []
+    for message in messages:
+        role = "Student" if isinstance(message, HumanMessage) else "Assistant"
+        lines.append(f"{role}: {message.content}")
+    return "\n".join(lines)
+
+
+class RollingSummaryMemory(BaseChatMemory):
+    """Last ``max_turns`` turns verbatim plus a running summary of everything older.
+
+    Whenever a turn pushes the history past ``max_turns`` or ``max_tokens``,
+    only the turns falling out of the window are folded into the existing
+    summary with one LLM call, so the cost of a turn doesn't grow with the
+    length of the conversation.
+    """
+
+    llm: Any
+    summary: str = ""
+    memory_key: str = "chat_history"
+    max_turns: int = CHAT_HISTORY_TURNS
+    max_tokens: int = CHAT_HISTORY_MAX_TOKENS
+    summarized_turns: int = 0
+
+    @property
+    def memory_variables(self) -> List[str]:
+        return [self.memory_key]
+
+    def history_messages(self) -> List[BaseMessage]:
+        messages = list(self.chat_memory.messages)
+        if self.summary:
+            messages.insert(0, SystemMessage(content=f"Summary of earlier conversation: {self.summary}"))
+        return messages
+
+    def history_tokens(self):
+        return count_tokens(self.summary) + sum(count_tokens(m.content) for m in self.chat_memory.messages)
+
+    def load_memory_variables(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        messages = self.history_messages()
+        if self.return_messages:
+            return {self.memory_key: messages}
+        return {self.memory_key: format_lines(messages)}
+
+    def save_context(self, inputs: Dict[str, Any], outputs: Dict[str, str]) -> None:
+        super().save_context(inputs, outputs)
+        self.fold()
+
+    def fold(self):
+        messages = self.chat_memory.messages
+        keep = len(messages)
+        # Walk the window back a whole turn at a time; the latest turn always stays.
+        while keep > 2 and (
+            keep > 2 * self.max_turns
+            or count_tokens(self.summary) + sum(count_tokens(m.content) for m in messages[-keep:]) > self.max_tokens
+        ):
+            keep -= 2
+        if keep == len(messages):
+            return
+        folded = messages[:len(messages) - keep]
+        try:
+            self.summary = self.llm.invoke(SUMMARY_PROMPT.format(
+                summary=self.summary or "(none)",
+                new_lines=format_lines(folded),
+                max_words=max(50, self.max_tokens // 4),
+            )).content.strip()
+        except Exception as e:
+            # Losing detail from old turns beats overflowing the context window.
+            logger.error(f"Could not fold {len(folded)} messages into the chat summary: {e}")
+        self.chat_memory.messages = messages[len(messages) - keep:]
+        self.summarized_turns += len(folded) // 2
+
+    def clear(self) -> None:
+        super().clear()
+        self.summary = ""
+        self.summarized_turns = 0
+
+    def to_state(self):
+        messages = []
+        for message in self.chat_memory.messages:
+            if isinstance(message, HumanMessage):
+                messages.append({"role": "user", "content": message.content})
+            elif isinstance(message, AIMessage):
+                messages.append({"role": "assistant", "content": message.content})
+        return {"messages": messages, "summary": self.summary, "summarized_turns": self.summarized_turns}
+
+    @classmethod
+    def from_state(cls, llm, state=None, **kwargs):
+        state = state or {}
+        memory = cls(
+            llm=llm,
+            summary=state.get("summary", ""),
+            summarized_turns=state.get("summarized_turns", 0),
+            **kwargs,
+        )
+        for message in state.get("messages", []):
+            if message["role"] == "user":
+                memory.chat_memory.add_user_message(message["content"])
+            else:
+                memory.chat_memory.add_ai_message(message["content"])
+        return memory
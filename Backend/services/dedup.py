@@ -0,0 +1,144 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def hash_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_text(text):
+    """SHA-256 of the text with whitespace collapsed, so re-exports of the
+    same PDF with different line wrapping still match."""
+    normalized = re.sub(r"\s+", " ", text).strip()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class DedupRegistry:
+    """Maps content hashes of uploaded PDFs to the file_id that indexes them.
+
+    Every upload that resolves to a file_id takes a reference on it, so a
+    shared index is only dropped once the last uploader releases it. Uploads
+    whose duplicate is only detected after a file_id was handed out are
+    recorded as aliases of the canonical file_id. When ``path`` is given the
+    registry is mirrored to a JSON file next to the persistent indexes.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._by_bytes = {}
+        self._by_text = {}
+        self._refcounts = {}
+        self._aliases = {}
+        self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            self._by_bytes = data.get("by_bytes", {})
+            self._by_text = data.get("by_text", {})
+            self._refcounts = data.get("refcounts", {})
+            self._aliases = data.get("aliases", {})
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not read dedup registry {self.path}: {e}")
+
+    def _save(self):
+        if not self.path:
+            return
+        data = {
+            "by_bytes": self._by_bytes,
+            "by_text": self._by_text,
+            "refcounts": self._refcounts,
+            "aliases": self._aliases,
+        }
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=".dedup-", dir=directory)
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    def lookup_bytes(self, bytes_hash):
+        with self._lock:
+            return self._by_bytes.get(bytes_hash)
+
+    def lookup_text(self, text_hash):
+        with self._lock:
+            return self._by_text.get(text_hash)
+
+    def register(self, file_id, bytes_hash=None, text_hash=None):
+        with self._lock:
+            if bytes_hash:
+                self._by_bytes[bytes_hash] = file_id
+            if text_hash:
+                self._by_text[text_hash] = file_id
+            self._save()
+
+    def unregister(self, file_id):
+        """Stop matching new uploads to ``file_id`` (its content has changed)."""
+        with self._lock:
+            self._by_bytes = {h: fid for h, fid in self._by_bytes.items() if fid != file_id}
+            self._by_text = {h: fid for h, fid in self._by_text.items() if fid != file_id}
+            self._save()
+
+    def alias(self, file_id, canonical_id):
+        with self._lock:
+            self._aliases[file_id] = canonical_id
+            self._save()
+
+    def resolve(self, file_id):
+        """Return the canonical file_id that actually holds the index."""
+        with self._lock:
+            return self._aliases.get(file_id, file_id)
+
+    def acquire(self, file_id, count=1):
+        """Take ``count`` references on ``file_id``; returns how many it now has."""
+        with self._lock:
+            self._refcounts[file_id] = self._refcounts.get(file_id, 0) + count
+            self._save()
+            return self._refcounts[file_id]
+
+    def release(self, file_id):
+        """Drop one reference; returns how many are left (0 means unused)."""
+        with self._lock:
+            count = max(0, self._refcounts.get(file_id, 0) - 1)
+            if count:
+                self._refcounts[file_id] = count
+            else:
+                self._forget(file_id)
+            self._save()
+            return count
+
+    def refcount(self, file_id):
+        with self._lock:
+            return self._refcounts.get(file_id, 0)
+
+    def forget(self, file_id):
+        with self._lock:
+            self._forget(file_id)
+            self._save()
+
+    def _forget(self, file_id):
+        self._refcounts.pop(file_id, None)
+        self._by_bytes = {h: fid for h, fid in self._by_bytes.items() if fid != file_id}
+        self._by_text = {h: fid for h, fid in self._by_text.items() if fid != file_id}
+        self._aliases = {a: fid for a, fid in self._aliases.items() if fid != file_id and a != file_id}
+
+    def stats(self):
+        with self._lock:
+            return {
+                "documents": len(self._refcounts),
+                "references": sum(self._refcounts.values()),
+                "shared": sum(1 for count in self._refcounts.values() if count > 1),
+                "aliases": len(self._aliases),
+            }
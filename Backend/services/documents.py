@@ -0,0 +1,133 @@
+import sys
+
+from services.pdf_extract import join_pages
+
+# Between sources in the document-wide text
+SOURCE_SEPARATOR = "\n\n"
+
+
+class SourceText:
+    """Canonical text of one uploaded PDF with its page boundaries.
+
+    ``text`` is exactly ``join_pages(pages)``, the string chunk
+    ``char_start``/``char_end`` offsets point into.
+    """
+
+    def __init__(self, source_id, name, text, pages):
+        self.source_id = source_id
+        self.name = name
+        self.text = text
+        self.pages = pages  # [(page_number, start, end), ...] into ``text``
+
+    @classmethod
+    def from_pages(cls, source_id, name, pages):
+        spans = []
+        offset = 0
+        for page_number, page_text in pages:
+            if not page_text:
+                continue
+            spans.append((page_number, offset, offset + len(page_text)))
+            offset += len(page_text) + 1
+        return cls(source_id, name, join_pages(pages), spans)
+
+    def page_range(self, first=None, last=None):
+        """Text of pages ``first``..``last`` inclusive (open ends allowed)."""
+        spans = [(start, end) for page, start, end in self.pages
+                 if (first is None or page >= first) and (last is None or page <= last)]
+        if not spans:
+            return ""
+        return self.text[spans[0][0]:spans[-1][1]]
+
+
+class DocumentText:
+    """De-duplicated text of an indexed document, one ``SourceText`` per PDF.
+
+    Built once at ingestion and stored next to the index, so summaries,
+    study plans and unit extraction read the document without re-joining
+    (and re-duplicating the overlap of) its chunks. ``approximate`` marks
+    documents reconstructed from chunks of an index built before this
+    existed.
+    """
+
+    def __init__(self, sources=(), approximate=False):
+        self.sources = list(sources)
+        self.approximate = approximate
+        self._text = None
+
+    def __len__(self):
+        return sum(len(source.text) for source in self.sources)
+
+    def memory_bytes(self):
+        """Rough resident size: source texts, page spans, and the joined text once built."""
+        size = sum(sys.getsizeof(source.text) + len(source.pages) * 80 for source in self.sources)
+        if self._text is not None and not (len(self.sources) == 1 and self._text is self.sources[0].text):
+            size += sys.getsizeof(self._text)
+        return size
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["_text"] = None
+        return state
+
+    @property
+    def text(self):
+        """Whole document; joined once and kept (a single source is returned as is)."""
+        if self._text is None:
+            if len(self.sources) == 1:
+                self._text = self.sources[0].text
+            else:
+                self._text = SOURCE_SEPARATOR.join(source.text for source in self.sources)
+        return self._text
+
+    def source(self, source_id):
+        for source in self.sources:
+            if source.source_id == source_id:
+                return source
+        return None
+
+    def chunk_text(self, metadata):
+        """Exact canonical span a chunk was cut from, or ``None`` without offsets."""
+        source = self.source(metadata.get("source"))
+        if source is None or "char_start" not in metadata:
+            return None
+        return source.text[metadata["char_start"]:metadata["char_end"]]
+
+    def with_source(self, source):
+        return DocumentText(self.sources + [source], approximate=self.approximate)
+
+    def without_source(self, source_id):
+        return DocumentText([s for s in self.sources if s.source_id != source_id], approximate=self.approximate)
+
+    def describe(self):
+        return [
+            {
+                "source_id": source.source_id,
+                "name": source.name,
+                "characters": len(source.text),
+                "pages": [page for page, _, _ in source.pages],
+            }
+            for source in self.sources
+        ]
+
+    @classmethod
+    def from_chunks(cls, documents):
+        """Best-effort rebuild from a legacy index's chunks, in index order.
+
+        Chunks that carry offsets are placed by them and fully overlapped
+        ones are dropped; the rest are concatenated as they are.
+        """
+        grouped = {}
+        for doc in documents:
+            grouped.setdefault(doc.metadata.get("source"), []).append(doc)
+        sources = []
+        for source_id, docs in grouped.items():
+            parts, covered = [], -1
+            for doc in sorted(docs, key=lambda d: d.metadata.get("char_start", 0)):
+                end = doc.metadata.get("char_end")
+                if end is not None and end <= covered:
+                    continue
+                parts.append(doc.page_content)
+                covered = end if end is not None else covered
+            name = docs[0].metadata.get("source_name")
+            sources.append(SourceText(source_id, name, "\n".join(parts), []))
+        return cls(sources, approximate=True)
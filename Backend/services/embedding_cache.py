@@ -0,0 +1,89 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from array import array
+
+logger = logging.getLogger(__name__)
+
+# SQLite caps the number of bound parameters per statement
+_LOOKUP_BATCH = 500
+
+
+def chunk_key(model_name, normalize, text):
+    payload = f"{model_name}\0{int(bool(normalize))}\0{text}".encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
+class EmbeddingCache:
+    """Persistent chunk-embedding cache keyed by (model, normalization, text hash).
+
+    Vectors are stored as packed float32 blobs in SQLite (WAL mode, so
+    several uvicorn workers can share one file).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, keys):
+        """Return ``{key: vector}`` for the keys that are cached."""
+        found = {}
+        unique = list(dict.fromkeys(keys))
+        with self._lock:
+            for start in range(0, len(unique), _LOOKUP_BATCH):
+                batch = unique[start:start + _LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+            hits = sum(1 for key in keys if key in found)
+            self.hits += hits
+            self.misses += len(keys) - hits
+        return found
+
+    def put_many(self, items):
+        rows = [(key, array("f", vector).tobytes()) for key, vector in items]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)", rows)
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            entries, vector_bytes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+            ).fetchone()
+            lookups = self.hits + self.misses
+            return {
+                "entries": entries,
+                "vector_bytes": vector_bytes,
+                "file_bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+def get_embedding_cache():
+    """Open the cache at ``EMBEDDING_CACHE_PATH``; an empty value disables it."""
+    path = os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache.sqlite3")
+    if not path:
+        return None
+    try:
+        return EmbeddingCache(path)
+    except sqlite3.Error as e:
+        logger.error(f"Embedding cache disabled, could not open {path}: {e}")
+        return None
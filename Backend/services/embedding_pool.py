@@ -0,0 +1,124 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Rough resident size of one model copy, used to cap workers under the memory ceiling.
+WORKER_MEMORY_MB = {"torch": 2600, "onnx-int8": 900}
+
+_worker_model = None
+
+
+def _init_worker(model_name, backend, normalize, threads):
+    global _worker_model
+    if backend == "torch":
+        import torch
+        torch.set_num_threads(threads)
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+        _worker_model = HuggingFaceEmbeddings(
+            model_name=model_name,
+            model_kwargs={"device": "cpu"},
+            encode_kwargs={"normalize_embeddings": normalize}
+        )
+    else:
+        from services.onnx_embeddings import OnnxEmbeddings
+        _worker_model = OnnxEmbeddings(
+            os.getenv("ONNX_MODEL_DIR", "models/bge-m3-int8"), normalize=normalize, threads=threads
+        )
+
+
+def _embed_batch(texts):
+    return _worker_model.embed_documents(texts)
+
+
+def plan_batches(texts, max_batch_tokens, max_batch_size=128):
+    """Split ``texts`` into contiguous ``(start, end)`` ranges of similar padded cost.
+
+    A batch costs roughly ``size * longest`` tokens once padded, so short
+    chunks are packed into large batches and long ones into small batches.
+    Tokens are estimated at four characters each.
+    """
+    batches, start, longest = [], 0, 0
+    for i, text in enumerate(texts):
+        tokens = max(1, len(text) // 4)
+        size = i - start + 1
+        if size > 1 and (size > max_batch_size or max(longest, tokens) * size > max_batch_tokens):
+            batches.append((start, i))
+            start, longest = i, 0
+        longest = max(longest, tokens)
+    if start < len(texts):
+        batches.append((start, len(texts)))
+    return batches
+
+
+class EmbeddingPool:
+    """Shards chunk lists across worker processes, each holding its own model copy.
+
+    Batches are contiguous ranges, so results can be yielded in input order
+    as soon as every earlier batch is done, and FAISS can be filled while
+    later batches are still encoding.
+    """
+
+    def __init__(self, model_name, backend, normalize, workers, max_batch_tokens=16384):
+        self.workers = workers
+        self.max_batch_tokens = max_batch_tokens
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        context = multiprocessing.get_context("spawn")
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(model_name, backend, normalize, threads),
+        )
+        logger.info(f"Started embedding pool: {workers} workers x {threads} threads")
+
+    def iter_embed(self, texts):
+        """Yield lists of vectors, in order, one per planned batch."""
+        futures = [self._executor.submit(_embed_batch, texts[start:end])
+                   for start, end in plan_batches(texts, self.max_batch_tokens)]
+        try:
+            for future in futures:
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def get_pool_workers(backend):
+    """Workers from ``EMBED_WORKERS``, capped by ``EMBED_MEMORY_LIMIT_MB``.
+
+    Returns 0 when sharding is disabled (the default is a single in-process model).
+    """
+    workers = int(os.getenv("EMBED_WORKERS", "0"))
+    if workers <= 1:
+        return 0
+    limit_mb = int(os.getenv("EMBED_MEMORY_LIMIT_MB", "0"))
+    if limit_mb:
+        per_worker = int(os.getenv("EMBED_WORKER_MEMORY_MB", WORKER_MEMORY_MB.get(backend, 2600)))
+        workers = min(workers, limit_mb // per_worker)
+    return workers if workers > 1 else 0
+
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+
+def get_embedding_pool(model_name, backend, normalize):
+    """Process-wide pool, started on first use; ``None`` when sharding is off."""
+    global _POOL
+    workers = get_pool_workers(backend)
+    if not workers:
+        return None
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = EmbeddingPool(
+                model_name, backend, normalize, workers,
+                max_batch_tokens=int(os.getenv("EMBED_BATCH_TOKENS", "16384"))
+            )
+        return _POOL
@@ -0,0 +1,213 @@
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from langchain_core.embeddings import Embeddings
+from langchain_community.embeddings import HuggingFaceEmbeddings
+
+from services.embedding_cache import chunk_key, get_embedding_cache
+from services.embedding_pool import get_embedding_pool
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "BAAI/bge-m3")
+# "torch" (sentence-transformers, fp32) or "onnx-int8" (services.onnx_embeddings)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+# Documents with fewer chunks than this are encoded by the in-process model
+EMBED_POOL_MIN_CHUNKS = int(os.getenv("EMBED_POOL_MIN_CHUNKS", "256"))
+# In-process ingestion encodes this many chunks per hold of the model, so a
+# query waits for at most one slice rather than a whole batch
+EMBED_INGEST_SLICE = int(os.getenv("EMBED_INGEST_SLICE", "8"))
+
+
+class _EncodeLock:
+    """Serializes model calls, letting query encodes go ahead of ingestion.
+
+    ``threading.Lock`` is not fair: with two ingestion workers a chat question
+    could wait through several batches. Here ingestion only takes the model
+    when no query is waiting.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._busy = False
+        self._queries_waiting = 0
+
+    @contextmanager
+    def hold(self, query=False):
+        with self._cond:
+            if query:
+                self._queries_waiting += 1
+            try:
+                while self._busy or (not query and self._queries_waiting):
+                    self._cond.wait()
+            finally:
+                if query:
+                    self._queries_waiting -= 1
+            self._busy = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._busy = False
+                self._cond.notify_all()
+
+
+class SharedEmbeddings(Embeddings):
+    """One embedding model per process, shared by ingestion, queries and reranking.
+
+    The model is loaded on first use (or by ``warm_up``) under a lock so
+    concurrent first callers do not each load ~2 GB of weights. Encoding is
+    serialized as well: torch already spreads a single batch over every core,
+    so running two batches at once only adds contention. Query encodes take
+    the model ahead of ingestion, which gives it up every ``EMBED_INGEST_SLICE`` chunks.
+
+    With a ``cache`` only chunks that were never embedded before reach the
+    model; everything else is served from the chunk-embedding cache.
+    """
+
+    def __init__(self, model_name=EMBEDDING_MODEL, normalize=True, device="cpu", cache=None,
+                 backend=EMBEDDING_BACKEND):
+        self.model_name = model_name
+        self.normalize = normalize
+        self.device = device
+        self.cache = cache
+        self.backend = backend
+        self._model = None
+        self._load_lock = threading.Lock()
+        self._encode_lock = _EncodeLock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    started = time.perf_counter()
+                    self._model = self._load_backend()
+                    logger.info(f"Loaded embedding model {self.model_id} in {time.perf_counter() - started:.1f}s")
+        return self._model
+
+    def _load_backend(self):
+        if self.backend == "onnx-int8":
+            from services.onnx_embeddings import OnnxEmbeddings
+            return OnnxEmbeddings(
+                os.getenv("ONNX_MODEL_DIR", "models/bge-m3-int8"),
+                normalize=self.normalize,
+                batch_size=int(os.getenv("ONNX_BATCH_SIZE", "16"))
+            )
+        if self.backend != "torch":
+            raise ValueError(f"Unknown EMBEDDING_BACKEND {self.backend!r}; expected 'torch' or 'onnx-int8'.")
+        return HuggingFaceEmbeddings(
+            model_name=self.model_name,
+            model_kwargs={"device": self.device},
+            encode_kwargs={"normalize_embeddings": self.normalize}
+        )
+
+    @property
+    def model_id(self):
+        """Model name plus backend, so int8 and fp32 vectors never share cache entries."""
+        if self.backend == "torch":
+            return self.model_name
+        return f"{self.model_name}@{self.backend}"
+
+    @property
+    def loaded(self):
+        return self._model is not None
+
+    def _encode(self, texts):
+        model = self.model
+        step = max(1, EMBED_INGEST_SLICE)
+        vectors = []
+        for start in range(0, len(texts), step):
+            with self._encode_lock.hold():
+                vectors.extend(model.embed_documents(texts[start:start + step]))
+        return vectors
+
+    def _iter_encode(self, texts, batch_size):
+        pool = None
+        if len(texts) >= EMBED_POOL_MIN_CHUNKS:
+            pool = get_embedding_pool(self.model_name, self.backend, self.normalize)
+        if pool is not None:
+            yield from pool.iter_embed(texts)
+            return
+        for start in range(0, len(texts), batch_size):
+            yield self._encode(texts[start:start + batch_size])
+
+    def iter_embed_documents(self, texts, batch_size=32):
+        """Yield vectors for ``texts`` in order, a batch at a time.
+
+        Cached chunks are served without touching the model; the rest are
+        encoded in-process or, for large documents, sharded across the
+        embedding pool. Each yielded list continues where the previous one
+        stopped, so callers can stream straight into an index.
+        """
+        if not texts:
+            return
+        if self.cache is None:
+            yield from self._iter_encode(texts, batch_size)
+            return
+        keys = [chunk_key(self.model_id, self.normalize, text) for text in texts]
+        known = self.cache.get_many(keys)
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in known and key not in missing:
+                missing[key] = text
+        logger.info(f"Embedding {len(texts)} chunks, {len(texts) - len(missing)} from cache")
+
+        missing_keys = iter(list(missing))
+        ready = 0
+        for vectors in self._iter_encode(list(missing.values()), batch_size):
+            computed = [(next(missing_keys), vector) for vector in vectors]
+            self.cache.put_many(computed)
+            known.update(computed)
+            end = ready
+            while end < len(keys) and keys[end] in known:
+                end += 1
+            if end > ready:
+                yield [known[key] for key in keys[ready:end]]
+                ready = end
+        if ready < len(keys):
+            yield [known[key] for key in keys[ready:]]
+
+    def embed_documents(self, texts):
+        vectors = []
+        for batch in self.iter_embed_documents(texts):
+            vectors.extend(batch)
+        return vectors
+
+    def embed_query(self, text):
+        model = self.model
+        with self._encode_lock.hold(query=True):
+            return model.embed_query(text)
+
+    def warm_up(self, encode=True):
+        """Load the weights now and optionally run one encode to initialise torch kernels."""
+        model = self.model
+        if encode:
+            started = time.perf_counter()
+            with self._encode_lock.hold(query=True):
+                model.embed_query("warm up")
+            logger.info(f"Embedding warm-up encode took {time.perf_counter() - started:.2f}s")
+
+
+_EMBEDDINGS = None
+_EMBEDDINGS_LOCK = threading.Lock()
+
+
+def get_embeddings():
+    """Return the process-wide embedding service."""
+    global _EMBEDDINGS
+    if _EMBEDDINGS is None:
+        with _EMBEDDINGS_LOCK:
+            if _EMBEDDINGS is None:
+                _EMBEDDINGS = SharedEmbeddings(cache=get_embedding_cache())
+    return _EMBEDDINGS
+
+
+def warm_up_embeddings():
+    """Startup hook: preload per ``EMBEDDINGS_PRELOAD`` / ``EMBEDDINGS_WARMUP`` (both on by default)."""
+    if os.getenv("EMBEDDINGS_PRELOAD", "1") == "0":
+        return
+    get_embeddings().warm_up(encode=os.getenv("EMBEDDINGS_WARMUP", "1") != "0")
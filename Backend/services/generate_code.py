@@ -1,16 +1,10 @@
 from fastapi import APIRouter, Form
-from groq import Groq
-import os
 from dotenv import load_dotenv
 import re
+from services.llm_gateway import chat_model
 
 
 load_dotenv()
-API_KEY = os.getenv("GROQ_API_KEY")
-if not API_KEY:
-    raise EnvironmentError("GROQ_API_KEY not set in .env file.")
-
-client = Groq(api_key=API_KEY)
 router = APIRouter()
 
 def clean_code(text):
@@ -34,12 +28,8 @@ Output rules:
 3. Ensure the code is ready to run without modification.
 """
     try:
-        response = client.chat.completions.create(
-            model="llama3-70b-8192",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0
-        )
-        code = response.choices[0].message.content
+        response = await chat_model("llama3-70b-8192", temperature=0).ainvoke(prompt)
+        code = response.content
         cleaned_code = clean_code(code)
         return {"code": cleaned_code}
     except Exception as e:
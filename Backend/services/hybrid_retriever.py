@@ -0,0 +1,147 @@
+import math
+import re
+import sys
+from array import array
+from typing import Any, List
+
+import numpy as np
+from langchain.schema import BaseRetriever, Document
+
+# Identifiers, acronyms, formula names: "3NF", "tf-idf", "O(n)" -> "o", "n"; "snake_case", "x.y"
+_TOKEN_RE = re.compile(r"[a-z0-9_]+(?:[.\-'][a-z0-9_]+)*")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from how in is it of on or that the this to was what when where which "
+    "who why with explain define describe".split()
+)
+
+
+def tokenize(text):
+    return [token for token in _TOKEN_RE.findall(text.lower()) if token not in _STOPWORDS]
+
+
+def _is_identifier(raw):
+    """Tokens students type verbatim: acronyms, code names, anything with digits or symbols."""
+    return (
+        any(ch.isdigit() for ch in raw)
+        or any(ch in "_.-()=+*/<>" for ch in raw)
+        or (len(raw) >= 2 and raw.isupper())
+        or bool(re.search(r"[a-z][A-Z]", raw))
+    )
+
+
+class BM25Index:
+    """Compact Okapi BM25 inverted index over a document's chunks.
+
+    Postings are packed ``array`` columns (doc position, term frequency)
+    rather than per-posting Python objects, so the index costs a few bytes
+    per token occurrence and pickles quickly next to the FAISS files.
+    """
+
+    def __init__(self, doc_ids, texts, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_ids = list(doc_ids)
+        self.positions = {doc_id: position for position, doc_id in enumerate(self.doc_ids)}
+        self.doc_lengths = array("I")
+        postings = {}
+        for position, text in enumerate(texts):
+            tokens = tokenize(text)
+            self.doc_lengths.append(len(tokens))
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, count in counts.items():
+                docs, tfs = postings.setdefault(token, (array("I"), array("H")))
+                docs.append(position)
+                tfs.append(min(count, 65535))
+        self.postings = postings
+        n = len(self.doc_ids)
+        self.avgdl = (sum(self.doc_lengths) / n) if n else 0.0
+        self.idf = {
+            token: math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            for token, (docs, _) in postings.items()
+        }
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def memory_bytes(self):
+        """Rough resident size of the postings, vocabulary and per-chunk tables."""
+        size = sum(sys.getsizeof(doc_id) for doc_id in self.doc_ids) + len(self.doc_ids) * 100
+        size += self.doc_lengths.itemsize * len(self.doc_lengths)
+        for token, (docs, tfs) in self.postings.items():
+            # token string, two arrays, the postings and idf dict slots
+            size += sys.getsizeof(token) + 2 * 64 + docs.itemsize * len(docs) + tfs.itemsize * len(tfs) + 200
+        return size
+
+    def search(self, query, k=10):
+        """Return up to ``k`` ``(doc_id, score)`` pairs, best first."""
+        scores = {}
+        for token in set(tokenize(query)):
+            entry = self.postings.get(token)
+            if entry is None:
+                continue
+            idf = self.idf[token]
+            docs, tfs = entry
+            for position, tf in zip(docs, tfs):
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[position] / (self.avgdl or 1))
+                scores[position] = scores.get(position, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(self.doc_ids[position], score) for position, score in best]
+
+    def matches_all(self, doc_id, tokens):
+        position = self.positions[doc_id]
+        for token in tokens:
+            entry = self.postings.get(token)
+            if entry is None or position not in entry[0]:
+                return False
+        return True
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """Fuse ranked lists of ids; ``k`` damps the weight of top ranks."""
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return [doc_id for doc_id, _ in sorted(scores.items(), key=lambda item: item[1], reverse=True)]
+
+
+class HybridRetriever(BaseRetriever):
+    """BM25 + dense retrieval fused with reciprocal rank fusion.
+
+    Queries made of exact identifiers ("3NF", "ACID", "malloc()") that
+    BM25 answers with a chunk containing every identifier skip the dense
+    path entirely, saving the query embedding and vector search.
+    """
+
+    vector_store: Any
+    bm25: Any
+    k: int = 4
+    fetch_k: int = 20
+    rrf_k: int = 60
+
+    def _lexical_shortcut(self, query, lexical):
+        raw_tokens = re.findall(r"\S+", query)
+        identifiers = [raw for raw in raw_tokens if _is_identifier(raw.strip("?!,;:'\""))]
+        if not identifiers or len(raw_tokens) > 6 or not lexical:
+            return False
+        wanted = [token for raw in identifiers for token in tokenize(raw)]
+        return bool(wanted) and self.bm25.matches_all(lexical[0][0], wanted)
+
+    def _dense_ids(self, query):
+        store = self.vector_store
+        vector = np.asarray([store.embedding_function.embed_query(query)], dtype=np.float32)
+        _, positions = store.index.search(vector, self.fetch_k)
+        return [store.index_to_docstore_id[p] for p in positions[0] if p != -1]
+
+    def _get_relevant_documents(self, query, *, run_manager=None) -> List[Document]:
+        lexical = self.bm25.search(query, self.fetch_k)
+        if self._lexical_shortcut(query, lexical):
+            doc_ids = [doc_id for doc_id, _ in lexical]
+        else:
+            doc_ids = reciprocal_rank_fusion(
+                [[doc_id for doc_id, _ in lexical], self._dense_ids(query)], k=self.rrf_k
+            )
+        docstore = self.vector_store.docstore
+        return [docstore.search(doc_id) for doc_id in doc_ids[:self.k]]
@@ -0,0 +1,103 @@
+import logging
+import math
+import os
+
+import faiss
+
+logger = logging.getLogger(__name__)
+
+FLAT = "flat"
+HNSW = "hnsw"
+IVFPQ = "ivfpq"
+
+# "auto" picks from the chunk count and memory target; or force flat / hnsw / ivfpq
+INDEX_TYPE = os.getenv("INDEX_TYPE", "auto")
+INDEX_MEMORY_TARGET_MB = float(os.getenv("INDEX_MEMORY_TARGET_MB", "512"))
+FLAT_MAX_VECTORS = int(os.getenv("INDEX_FLAT_MAX_VECTORS", "50000"))
+HNSW_M = int(os.getenv("HNSW_M", "32"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "200"))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "64"))
+PQ_M = int(os.getenv("PQ_M", "64"))
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "16"))
+# IVF-PQ needs this many training vectors per centroid (and 256 per PQ codebook)
+IVF_TRAIN_PER_LIST = 39
+
+
+def estimate_index_bytes(kind, n, dim, m=HNSW_M, pq_m=PQ_M):
+    if kind == FLAT:
+        return n * dim * 4
+    if kind == HNSW:
+        # full vectors + ~2*M neighbour ids on level 0, plus upper levels
+        return int(n * (dim * 4 + m * 2 * 4 * 1.1))
+    nlist = ivf_nlist(n)
+    return n * (pq_m + 8) + nlist * dim * 4 + 256 * dim * 4
+
+
+def ivf_nlist(n):
+    return max(1, min(65536, int(4 * math.sqrt(n))))
+
+
+def choose_index_type(n, dim, memory_target_bytes=None):
+    """Exact flat for small corpora, HNSW while the vectors fit the memory
+    target, IVF-PQ (compressed) beyond that."""
+    if INDEX_TYPE != "auto":
+        return INDEX_TYPE
+    if memory_target_bytes is None:
+        memory_target_bytes = INDEX_MEMORY_TARGET_MB * 1024 * 1024
+    if n <= FLAT_MAX_VECTORS and estimate_index_bytes(FLAT, n, dim) <= memory_target_bytes:
+        return FLAT
+    # PQ training needs enough points; tiny-but-huge-dimension corpora stay on HNSW
+    if estimate_index_bytes(HNSW, n, dim) <= memory_target_bytes or n < ivf_nlist(n) * IVF_TRAIN_PER_LIST:
+        return HNSW
+    return IVFPQ
+
+
+def build_index(dim, n, kind=None):
+    """Return an empty FAISS index for ``n`` vectors of ``dim`` dimensions.
+
+    IVF-PQ indexes come back untrained; see ``training_size``.
+    """
+    kind = kind or choose_index_type(n, dim)
+    if kind == FLAT:
+        index = faiss.IndexFlatL2(dim)
+    elif kind == HNSW:
+        index = faiss.IndexHNSWFlat(dim, HNSW_M)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+    elif kind == IVFPQ:
+        pq_m = PQ_M if dim % PQ_M == 0 else math.gcd(dim, PQ_M)
+        quantizer = faiss.IndexFlatL2(dim)
+        index = faiss.IndexIVFPQ(quantizer, dim, ivf_nlist(n), pq_m, 8)
+        index.nprobe = IVF_NPROBE
+    else:
+        raise ValueError(f"Unknown index type {kind!r}; expected flat, hnsw or ivfpq.")
+    logger.info(f"Building {kind} index for {n} vectors of dim {dim}")
+    return index
+
+
+def training_size(index, n):
+    """How many vectors to buffer before ``index.train``; 0 if no training is needed."""
+    if index.is_trained:
+        return 0
+    nlist = getattr(index, "nlist", 1)
+    return min(n, max(nlist * IVF_TRAIN_PER_LIST, 256 * 39))
+
+
+def index_kind(index):
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexHNSW):
+        return HNSW
+    if isinstance(index, faiss.IndexIVF):
+        return IVFPQ
+    return FLAT
+
+
+def index_memory_bytes(index):
+    kind = index_kind(index)
+    if kind == HNSW:
+        return estimate_index_bytes(HNSW, index.ntotal, index.d, m=faiss.downcast_index(index).hnsw.nb_neighbors(1))
+    if kind == IVFPQ:
+        ivf = faiss.downcast_index(index)
+        code_size = getattr(ivf, "code_size", PQ_M)
+        return index.ntotal * (code_size + 8) + ivf.nlist * index.d * 4 + 256 * index.d * 4
+    return index.ntotal * index.d * 4
@@ -0,0 +1,197 @@
+import abc
+import logging
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+
+import faiss
+from langchain_community.vectorstores import FAISS
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = "index.faiss"
+DOCSTORE_FILE = "index.pkl"
+CURRENT_FILE = "CURRENT"
+
+
+class IndexStore(abc.ABC):
+    """Persistent home for per-file_id FAISS indexes.
+
+    Subclasses decide where the bytes live; callers only ever see
+    ``save`` / ``load`` / ``exists`` / ``delete`` keyed by ``file_id``.
+    """
+
+    @abc.abstractmethod
+    def save(self, file_id, vector_store):
+        """Persist ``vector_store`` as the new current version of ``file_id``."""
+
+    @abc.abstractmethod
+    def load(self, file_id, embedding, writable=False):
+        """The current ``FAISS`` store for ``file_id``, or ``None``; ``writable`` for one that will be modified."""
+
+    @abc.abstractmethod
+    def exists(self, file_id):
+        """Whether ``file_id`` has a stored index."""
+
+    @abc.abstractmethod
+    def delete(self, file_id):
+        """Remove every stored version of ``file_id``."""
+
+    def save_artifact(self, file_id, name, obj):
+        """Persist a derived structure next to the current index version (optional)."""
+
+    def load_artifact(self, file_id, name):
+        return None
+
+
+class LocalIndexStore(IndexStore):
+    """Stores each index under ``<root>/<file_id>/v<N>/``.
+
+    A version directory is written to a temp dir first and renamed into
+    place, then ``CURRENT`` is switched to it, so a crash mid-write never
+    leaves a half-written index behind and readers that memory-mapped an
+    older version keep working.
+    """
+
+    def __init__(self, root, mmap=True, keep_versions=2):
+        self.root = os.path.abspath(root)
+        self.mmap = mmap
+        self.keep_versions = max(1, keep_versions)
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def _file_dir(self, file_id):
+        # file_ids are generated by us, but never let one escape the root
+        safe_id = os.path.basename(str(file_id))
+        if not safe_id or safe_id in (".", ".."):
+            raise ValueError(f"Invalid file_id: {file_id!r}")
+        return os.path.join(self.root, safe_id)
+
+    def _versions(self, file_id):
+        file_dir = self._file_dir(file_id)
+        if not os.path.isdir(file_dir):
+            return []
+        versions = []
+        for name in os.listdir(file_dir):
+            if name.startswith("v") and name[1:].isdigit():
+                versions.append(int(name[1:]))
+        return sorted(versions)
+
+    def current_version(self, file_id):
+        current_path = os.path.join(self._file_dir(file_id), CURRENT_FILE)
+        try:
+            with open(current_path) as f:
+                return int(f.read().strip().lstrip("v"))
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def version_dir(self, file_id, version=None):
+        if version is None:
+            version = self.current_version(file_id)
+        if version is None:
+            return None
+        return os.path.join(self._file_dir(file_id), f"v{version}")
+
+    def save(self, file_id, vector_store):
+        file_dir = self._file_dir(file_id)
+        os.makedirs(file_dir, exist_ok=True)
+        with self._lock:
+            versions = self._versions(file_id)
+            version = (versions[-1] + 1) if versions else 1
+            tmp_dir = tempfile.mkdtemp(prefix=".tmp-", dir=file_dir)
+            try:
+                faiss.write_index(vector_store.index, os.path.join(tmp_dir, INDEX_FILE))
+                with open(os.path.join(tmp_dir, DOCSTORE_FILE), "wb") as f:
+                    pickle.dump((vector_store.docstore, vector_store.index_to_docstore_id), f)
+                os.replace(tmp_dir, os.path.join(file_dir, f"v{version}"))
+            except Exception:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                raise
+            self._write_current(file_id, version)
+            self._prune(file_id, version)
+        logger.info(f"Saved index for {file_id} as v{version} ({vector_store.index.ntotal} vectors)")
+        return version
+
+    def _write_current(self, file_id, version):
+        file_dir = self._file_dir(file_id)
+        fd, tmp_path = tempfile.mkstemp(prefix=".current-", dir=file_dir)
+        with os.fdopen(fd, "w") as f:
+            f.write(f"v{version}\n")
+        os.replace(tmp_path, os.path.join(file_dir, CURRENT_FILE))
+
+    def _prune(self, file_id, current):
+        # Keep the newest ``keep_versions`` versions, current included.
+        old = [v for v in self._versions(file_id) if v < current]
+        stale = old[:len(old) - (self.keep_versions - 1)]
+        for version in stale:
+            shutil.rmtree(self.version_dir(file_id, version), ignore_errors=True)
+
+    def load(self, file_id, embedding, writable=False):
+        """Current version of ``file_id``; memory-mapped read-only unless ``writable``."""
+        version_dir = self.version_dir(file_id)
+        if version_dir is None or not os.path.isdir(version_dir):
+            return None
+        index_path = os.path.join(version_dir, INDEX_FILE)
+        index = None
+        # mmapped IVF lists are read-only: they cannot be added to, cloned or serialized
+        if self.mmap and not writable:
+            try:
+                index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+            except RuntimeError as e:
+                # Not every index type supports mmap; fall back to a plain read.
+                logger.info(f"mmap load not supported for {file_id}, reading into memory: {e}")
+        if index is None:
+            index = faiss.read_index(index_path)
+        with open(os.path.join(version_dir, DOCSTORE_FILE), "rb") as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+        logger.info(f"Loaded index for {file_id} from {version_dir}")
+        return FAISS(
+            embedding_function=embedding,
+            index=index,
+            docstore=docstore,
+            index_to_docstore_id=index_to_docstore_id,
+        )
+
+    def exists(self, file_id):
+        version_dir = self.version_dir(file_id)
+        return version_dir is not None and os.path.isdir(version_dir)
+
+    def delete(self, file_id):
+        with self._lock:
+            shutil.rmtree(self._file_dir(file_id), ignore_errors=True)
+
+    def save_artifact(self, file_id, name, obj):
+        version_dir = self.version_dir(file_id)
+        if version_dir is None or not os.path.isdir(version_dir):
+            return
+        fd, tmp_path = tempfile.mkstemp(prefix=".artifact-", dir=version_dir)
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(obj, f)
+        os.replace(tmp_path, os.path.join(version_dir, f"{name}.pkl"))
+
+    def load_artifact(self, file_id, name):
+        version_dir = self.version_dir(file_id)
+        if version_dir is None:
+            return None
+        try:
+            with open(os.path.join(version_dir, f"{name}.pkl"), "rb") as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+
+
+def get_index_store():
+    """Build the configured index store, or ``None`` when persistence is off.
+
+    ``INDEX_STORE_DIR`` enables the local on-disk store (set it to an empty
+    string to keep indexes in memory only); ``INDEX_STORE_MMAP=0`` loads
+    indexes fully into RAM instead of memory-mapping them.
+    """
+    root = os.getenv("INDEX_STORE_DIR", "indexes")
+    if not root:
+        return None
+    mmap = os.getenv("INDEX_STORE_MMAP", "1") != "0"
+    keep_versions = int(os.getenv("INDEX_STORE_KEEP_VERSIONS", "2"))
+    return LocalIndexStore(root, mmap=mmap, keep_versions=keep_versions)
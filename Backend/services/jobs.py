@@ -0,0 +1,141 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobFailed(Exception):
+    """Raise from a job function to fail the job with a user-facing message."""
+
+
+class Job:
+    """Progress record for one background ingestion run."""
+
+    def __init__(self, file_id):
+        self.id = str(uuid.uuid4())
+        self.file_id = file_id
+        self.stage = QUEUED
+        self.pages_total = 0
+        self.pages_processed = 0
+        self.chunks_total = 0
+        self.chunks_embedded = 0
+        self.error = None
+        self.result = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self._stage_started = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def finished(self):
+        return self.stage in (DONE, FAILED)
+
+    def set_stage(self, stage):
+        with self._lock:
+            self.stage = stage
+            self._stage_started = time.monotonic()
+
+    def update(self, **progress):
+        with self._lock:
+            for key, value in progress.items():
+                setattr(self, key, value)
+
+    def eta_seconds(self):
+        """Remaining time for the current stage, extrapolated from its rate so far."""
+        with self._lock:
+            if self.stage == "extracting":
+                done, total = self.pages_processed, self.pages_total
+            elif self.stage == "embedding":
+                done, total = self.chunks_embedded, self.chunks_total
+            else:
+                return None
+            if not done or not total:
+                return None
+            elapsed = time.monotonic() - self._stage_started
+            return round(elapsed / done * (total - done), 1)
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "file_id": self.file_id,
+            "stage": self.stage,
+            "pages_total": self.pages_total,
+            "pages_processed": self.pages_processed,
+            "chunks_total": self.chunks_total,
+            "chunks_embedded": self.chunks_embedded,
+            "eta_seconds": self.eta_seconds(),
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    """Runs ingestion jobs on a small thread pool, off the event loop.
+
+    The heavy lifting (PyPDF2, torch) releases the GIL or runs in its own
+    process pool, so threads are enough to keep uvicorn responsive.
+    Finished jobs are kept for ``retention_seconds`` so clients can poll
+    the final state.
+    """
+
+    def __init__(self, workers=2, retention_seconds=3600):
+        self.retention_seconds = retention_seconds
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest")
+        self._jobs = {}
+        self._by_file = {}
+        self._lock = threading.Lock()
+
+    def submit(self, file_id, fn, *args, **kwargs):
+        """Queue ``fn(job, *args, **kwargs)``; its return value becomes ``job.result``."""
+        job = Job(file_id)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+            self._by_file[file_id] = job
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def _run(self, job, fn, args, kwargs):
+        stage = DONE
+        try:
+            job.result = fn(job, *args, **kwargs)
+        except JobFailed as e:
+            job.update(error=str(e))
+            stage = FAILED
+        except Exception as e:
+            logger.exception(f"Ingestion job {job.id} for {job.file_id} failed")
+            job.update(error=f"Ingestion failed: {e}")
+            stage = FAILED
+        job.finished_at = time.time()
+        job.set_stage(stage)
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def for_file(self, file_id):
+        with self._lock:
+            return self._by_file.get(file_id)
+
+    def _prune(self):
+        cutoff = time.time() - self.retention_seconds
+        for job_id, job in list(self._jobs.items()):
+            if job.finished and job.finished_at and job.finished_at < cutoff:
+                del self._jobs[job_id]
+                if self._by_file.get(job.file_id) is job:
+                    del self._by_file[job.file_id]
+
+
+def get_job_manager():
+    workers = int(os.getenv("INGEST_WORKERS", "2"))
+    retention = float(os.getenv("INGEST_JOB_RETENTION", "3600"))
+    return JobManager(workers=workers, retention_seconds=retention)
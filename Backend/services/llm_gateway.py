@@ -0,0 +1,515 @@
+import asyncio
+import copy
+import hashlib
+import heapq
+import itertools
+import json
+import logging
+import os
+import random
+import threading
+import time
+import weakref
+from concurrent.futures import Future
+
+import groq
+from langchain_groq import ChatGroq
+
+from services.tokens import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# Priority classes, lowest value served first
+INTERACTIVE = 0  # chat turns a student is waiting on
+ON_DEMAND = 1    # one-off generations: study plans, flashcards, MCQs, code, topics
+BATCH = 2        # map-reduce summarization and other bulk work
+
+# Per-model budgets (0 = unlimited); GROQ_MODEL_LIMITS overrides them per model,
+# e.g. {"llama3-70b-8192": {"rpm": 30, "tpm": 6000}}
+GROQ_RPM = float(os.getenv("GROQ_RPM", "30"))
+GROQ_TPM = float(os.getenv("GROQ_TPM", "30000"))
+# Share of each budget batch calls leave untouched, so chat is not stuck behind a drained bucket
+BATCH_RESERVE = float(os.getenv("LLM_BATCH_RESERVE", "0.2"))
+# Completion tokens assumed when a call sets no max_tokens; corrected from the reported usage
+COMPLETION_TOKENS = int(os.getenv("LLM_COMPLETION_TOKENS", "512"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "1"))
+LLM_RETRY_MAX_SECONDS = float(os.getenv("LLM_RETRY_MAX_SECONDS", "30"))
+
+# How often callers queued behind others re-check their turn
+_POLL_SECONDS = 0.05
+_MAX_SLEEP_SECONDS = 1.0
+
+
+def resolve_api_key():
+    """The Groq key for every model. ``GROQ1_API_KEY`` and ``GROQ_SUMMARIZATION_MODEL``
+    are older per-feature names, still honoured when ``GROQ_API_KEY`` is unset."""
+    key = os.getenv("GROQ_API_KEY")
+    if key:
+        return key
+    for legacy in ("GROQ1_API_KEY", "GROQ_SUMMARIZATION_MODEL"):
+        if os.getenv(legacy):
+            logger.warning(f"Using {legacy} as the Groq key; set GROQ_API_KEY instead")
+            return os.getenv(legacy)
+    raise EnvironmentError("GROQ_API_KEY not set in .env file.")
+
+
+class _Bucket:
+    """Token bucket refilled continuously at ``per_minute`` units per minute."""
+
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        if self.capacity:
+            self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait(self, amount):
+        if not self.capacity or self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount):
+        if self.capacity:
+            self.level -= amount
+
+
+class RateScheduler:
+    """Admits calls to one model within its requests- and tokens-per-minute budgets.
+
+    Waiting calls are served by priority, then arrival order. Tokens are
+    charged up front from an estimate and settled against the usage Groq
+    reports; a 429 pauses the model for every caller, not just the one that
+    hit it.
+    """
+
+    def __init__(self, rpm, tpm, batch_reserve=0.0):
+        self.requests = _Bucket(rpm)
+        self.tokens = _Bucket(tpm)
+        self.batch_reserve = batch_reserve
+        self._queue = []
+        self._seq = itertools.count()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _enqueue(self, priority):
+        ticket = (priority, next(self._seq))
+        with self._lock:
+            heapq.heappush(self._queue, ticket)
+        return ticket
+
+    def _leave(self, ticket):
+        with self._lock:
+            if ticket in self._queue:
+                self._queue.remove(ticket)
+                heapq.heapify(self._queue)
+
+    def _poll(self, ticket, tokens):
+        """Admit ``ticket`` and return 0 if it is first in line and within budget, else seconds to wait."""
+        with self._lock:
+            if self._queue[0] != ticket:
+                return _POLL_SECONDS
+            now = time.monotonic()
+            self.requests.refill(now)
+            self.tokens.refill(now)
+            reserve = self.batch_reserve if ticket[0] >= BATCH else 0.0
+            # a call bigger than the whole budget still goes once the bucket is full
+            tokens = min(tokens, self.tokens.capacity)
+            wait = max(
+                self._paused_until - now,
+                self.requests.wait(min(1 + self.requests.capacity * reserve, self.requests.capacity)),
+                self.tokens.wait(min(tokens + self.tokens.capacity * reserve, self.tokens.capacity)),
+            )
+            if wait > 0:
+                return wait
+            heapq.heappop(self._queue)
+            self.requests.take(1)
+            self.tokens.take(tokens)
+            return 0.0
+
+    def acquire(self, tokens, priority=ON_DEMAND):
+        ticket = self._enqueue(priority)
+        try:
+            while True:
+                wait = self._poll(ticket, tokens)
+                if not wait:
+                    return
+                time.sleep(min(wait, _MAX_SLEEP_SECONDS))
+        finally:
+            self._leave(ticket)
+
+    async def acquire_async(self, tokens, priority=ON_DEMAND):
+        ticket = self._enqueue(priority)
+        try:
+            while True:
+                wait = self._poll(ticket, tokens)
+                if not wait:
+                    return
+                await asyncio.sleep(min(wait, _MAX_SLEEP_SECONDS))
+        finally:
+            self._leave(ticket)
+
+    def settle(self, estimated, actual):
+        """Correct the up-front charge once the real token usage is known."""
+        if actual is None:
+            return
+        with self._lock:
+            self.tokens.take(actual - estimated)
+
+    def pause(self, seconds):
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+class _Flight:
+    def __init__(self):
+        self.future = Future()
+        self.waiters = 0
+        self.loop = None
+        self.cancel_upstream = None
+
+
+class SingleFlight:
+    """Coalesces identical calls in flight: the first caller for a key makes the
+    upstream call and every caller that joins before it finishes shares the
+    result, or its exception.
+
+    Callers may be threads or coroutines on any event loop. A coroutine that is
+    cancelled only stops waiting; the shared call is cancelled once nobody is
+    left waiting for it. Followers get a copy of the result, so callers that
+    mutate what they get back do not affect each other.
+
+    ``do`` blocks, so it must not run on an event loop thread: joining a flight
+    led by a coroutine on that same loop would wait forever. Such a call makes
+    its own upstream call instead of joining.
+    """
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+        self._stats = {"upstream": 0, "coalesced": 0}
+
+    def _join(self, key):
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            self._stats["upstream" if leader else "coalesced"] += 1
+            flight.waiters += 1
+            return flight, leader
+
+    def _resolve(self, key, flight, value=None, error=None, cancelled=False):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        if cancelled:
+            flight.future.cancel()
+        elif error is not None:
+            flight.future.set_exception(error)
+        else:
+            flight.future.set_result(value)
+
+    def _leave(self, key, flight, abandoned):
+        cancel = None
+        with self._lock:
+            flight.waiters -= 1
+            if abandoned and not flight.waiters and not flight.future.done():
+                # nobody wants the answer any more; later callers start a fresh flight
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                cancel = flight.cancel_upstream
+        if cancel is not None:
+            cancel()
+
+    def do(self, key, create):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        with self._lock:
+            flight = self._flights.get(key)
+            if loop is not None and flight is not None and flight.loop is loop:
+                logger.warning("Blocking LLM call on an event loop thread; not coalesced with the in-flight request")
+                return create()
+        flight, leader = self._join(key)
+        try:
+            if not leader:
+                return copy.deepcopy(flight.future.result())
+            try:
+                value = create()
+            except BaseException as e:
+                self._resolve(key, flight, error=e)
+                raise
+            self._resolve(key, flight, value)
+            return value
+        finally:
+            self._leave(key, flight, abandoned=False)
+
+    async def do_async(self, key, create):
+        flight, leader = self._join(key)
+        if leader:
+            loop = flight.loop = asyncio.get_running_loop()
+            task = loop.create_task(create())
+            flight.cancel_upstream = lambda: loop.call_soon_threadsafe(task.cancel)
+            task.add_done_callback(lambda done: self._resolve(
+                key, flight,
+                cancelled=done.cancelled(),
+                error=None if done.cancelled() else done.exception(),
+                value=None if done.cancelled() or done.exception() else done.result(),
+            ))
+        try:
+            # shielded, so one caller giving up does not cancel the shared future
+            value = await asyncio.shield(asyncio.wrap_future(flight.future))
+        except asyncio.CancelledError:
+            self._leave(key, flight, abandoned=True)
+            raise
+        self._leave(key, flight, abandoned=False)
+        return value if leader else copy.deepcopy(value)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, in_flight=len(self._flights))
+
+
+class LLMGateway:
+    """The one path to Groq: a scheduler per model, jittered retries, and shared HTTP clients.
+
+    The sync client is shared by every model and thread. Async clients hold
+    connections bound to an event loop, so there is one per loop (the API
+    server's, and each ``asyncio.run`` from Streamlit).
+    """
+
+    def __init__(self, rpm=GROQ_RPM, tpm=GROQ_TPM, model_limits=None, max_retries=LLM_MAX_RETRIES,
+                 retry_base=LLM_RETRY_BASE_SECONDS, retry_max=LLM_RETRY_MAX_SECONDS):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.model_limits = model_limits or {}
+        self.max_retries = max_retries
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self._schedulers = {}
+        self._client = None
+        self._async_clients = weakref.WeakKeyDictionary()
+        self._models = {}
+        self._loop_models = weakref.WeakKeyDictionary()
+        self.inflight = SingleFlight()
+        self._lock = threading.Lock()
+
+    def scheduler(self, model):
+        with self._lock:
+            scheduler = self._schedulers.get(model)
+            if scheduler is None:
+                limits = self.model_limits.get(model, {})
+                scheduler = self._schedulers[model] = RateScheduler(
+                    float(limits.get("rpm", self.rpm)), float(limits.get("tpm", self.tpm)), BATCH_RESERVE
+                )
+            return scheduler
+
+    def _clients(self, loop):
+        """Sync and async Groq completion clients; retries are ours, so the SDK's are off."""
+        with self._lock:
+            if self._client is None:
+                self._client = groq.Groq(api_key=resolve_api_key(), max_retries=0)
+            if loop is None:
+                return self._client.chat.completions, None
+            async_client = self._async_clients.get(loop)
+            if async_client is None:
+                async_client = self._async_clients[loop] = groq.AsyncGroq(api_key=resolve_api_key(), max_retries=0)
+            return self._client.chat.completions, async_client.chat.completions
+
+    def chat_model(self, model, priority=ON_DEMAND, **params):
+        """A LangChain chat model for ``model`` routed through this gateway, cached per parameters."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        key = (model, priority, tuple(sorted(params.items())))
+        with self._lock:
+            models = self._models if loop is None else self._loop_models.setdefault(loop, {})
+            llm = models.get(key)
+        if llm is None:
+            client, async_client = self._clients(loop)
+            options = dict(params)
+            if async_client is not None:
+                options["async_client"] = async_client
+            llm = GatewayChatModel(
+                model=model, api_key=resolve_api_key(), client=client, max_retries=0, priority=priority, **options
+            )
+            with self._lock:
+                llm = models.setdefault(key, llm)
+        return llm
+
+    def _retry_delay(self, scheduler, model, error, attempt):
+        """Seconds before retrying ``error``, or ``None`` when it should be raised."""
+        status = getattr(error, "status_code", None)
+        retryable = status == 429 or (status is not None and status >= 500) or isinstance(error, groq.APIConnectionError)
+        if not retryable or attempt >= self.max_retries:
+            return None
+        backoff = min(self.retry_max, self.retry_base * 2 ** attempt)
+        delay = backoff / 2 + random.uniform(0, backoff / 2)
+        if status == 429:
+            response = getattr(error, "response", None)
+            try:
+                delay = max(delay, float(response.headers.get("retry-after", 0)))
+            except (AttributeError, TypeError, ValueError):
+                pass
+            scheduler.pause(delay)
+        logger.warning(f"Groq {model} call failed ({status or type(error).__name__}), retry {attempt + 1} in {delay:.1f}s")
+        return delay
+
+    def call(self, model, priority, tokens, send, usage=None):
+        """Run ``send()`` once admitted, retrying rate limits and server errors.
+
+        Budget waits and retry backoff sleep the calling thread, so this must
+        not run on an event loop; async code uses ``acall`` (``ainvoke``).
+        """
+        scheduler = self.scheduler(model)
+        for attempt in itertools.count():
+            scheduler.acquire(tokens, priority)
+            try:
+                result = send()
+            except Exception as e:
+                delay = self._retry_delay(scheduler, model, e, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            scheduler.settle(tokens, usage(result) if usage else None)
+            return result
+
+    async def acall(self, model, priority, tokens, send, usage=None):
+        scheduler = self.scheduler(model)
+        for attempt in itertools.count():
+            await scheduler.acquire_async(tokens, priority)
+            try:
+                result = await send()
+            except Exception as e:
+                delay = self._retry_delay(scheduler, model, e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            scheduler.settle(tokens, usage(result) if usage else None)
+            return result
+
+    def stream(self, model, priority, tokens, start):
+        """Chunks of ``start()``; retried only until the first chunk arrives."""
+        scheduler = self.scheduler(model)
+        for attempt in itertools.count():
+            scheduler.acquire(tokens, priority)
+            chunks = iter(start())
+            try:
+                first = next(chunks)
+            except StopIteration:
+                return
+            except Exception as e:
+                delay = self._retry_delay(scheduler, model, e, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            yield first
+            yield from chunks
+            return
+
+    async def astream(self, model, priority, tokens, start):
+        scheduler = self.scheduler(model)
+        for attempt in itertools.count():
+            await scheduler.acquire_async(tokens, priority)
+            chunks = start().__aiter__()
+            try:
+                first = await chunks.__anext__()
+            except StopAsyncIteration:
+                return
+            except Exception as e:
+                delay = self._retry_delay(scheduler, model, e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            yield first
+            async for chunk in chunks:
+                yield chunk
+            return
+
+
+def _result_tokens(result):
+    return ((result.llm_output or {}).get("token_usage") or {}).get("total_tokens")
+
+
+class GatewayChatModel(ChatGroq):
+    """``ChatGroq`` whose calls are scheduled and retried by the gateway.
+
+    Identical completions in flight at the same time share one upstream call.
+    Streams are not coalesced: each one is a chat turn with its own history.
+    """
+
+    priority: int = ON_DEMAND
+
+    def _estimate(self, messages, kwargs):
+        prompt = sum(count_tokens(m.content) for m in messages if isinstance(m.content, str))
+        return prompt + (kwargs.get("max_tokens") or self.max_tokens or COMPLETION_TOKENS)
+
+    def _flight_key(self, messages, stop, kwargs):
+        """Identical requests: same model and parameters, same prompt."""
+        payload = json.dumps(
+            {"params": self._default_params, "stop": stop, "kwargs": kwargs,
+             "messages": [[m.type, m.content] for m in messages]},
+            sort_keys=True, default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        gateway = get_gateway()
+        return gateway.inflight.do(self._flight_key(messages, stop, kwargs), lambda: gateway.call(
+            self.model_name, self.priority, self._estimate(messages, kwargs),
+            lambda: ChatGroq._generate(self, messages, stop, run_manager, **kwargs), _result_tokens
+        ))
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        gateway = get_gateway()
+        return await gateway.inflight.do_async(self._flight_key(messages, stop, kwargs), lambda: gateway.acall(
+            self.model_name, self.priority, self._estimate(messages, kwargs),
+            lambda: ChatGroq._agenerate(self, messages, stop, run_manager, **kwargs), _result_tokens
+        ))
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        return get_gateway().stream(
+            self.model_name, self.priority, self._estimate(messages, kwargs),
+            lambda: ChatGroq._stream(self, messages, stop, run_manager, **kwargs)
+        )
+
+    def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        return get_gateway().astream(
+            self.model_name, self.priority, self._estimate(messages, kwargs),
+            lambda: ChatGroq._astream(self, messages, stop, run_manager, **kwargs)
+        )
+
+
+_GATEWAY = None
+_GATEWAY_LOCK = threading.Lock()
+
+
+def get_gateway():
+    """Process-wide gateway configured by ``GROQ_RPM``, ``GROQ_TPM``, ``GROQ_MODEL_LIMITS``
+    (JSON, per-model overrides) and the ``LLM_RETRY_*`` / ``LLM_MAX_RETRIES`` settings."""
+    global _GATEWAY
+    with _GATEWAY_LOCK:
+        if _GATEWAY is None:
+            try:
+                model_limits = json.loads(os.getenv("GROQ_MODEL_LIMITS") or "{}")
+            except ValueError as e:
+                logger.error(f"Ignoring malformed GROQ_MODEL_LIMITS: {e}")
+                model_limits = {}
+            _GATEWAY = LLMGateway(model_limits=model_limits)
+        return _GATEWAY
+
+
+def chat_model(model, priority=ON_DEMAND, **params):
+    """Shared chat model for ``model``; use this instead of constructing ``ChatGroq``."""
+    return get_gateway().chat_model(model, priority, **params)
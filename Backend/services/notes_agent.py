@@ -1,22 +1,16 @@
 # services/notes_agent.py
 
-import os
 from typing import List
-from langchain_groq import ChatGroq
 from langchain.prompts import PromptTemplate
 from langchain.chains import LLMChain
+from services.artifact_cache import get_artifact_cache
+from services.llm_gateway import chat_model
+from services.prompt_versions import TOPICS_PROMPT_VERSION
 
 class NotesAgent:
-    def __init__(self, api_key: str = None, model: str = "llama-3.1-8b-instant"):
-        self.api_key = api_key or os.getenv("GROQ_API_KEY")
-        if not self.api_key:
-            raise ValueError("GROQ_API_KEY not found. Please set it in environment variables.")
-
-        self.llm = ChatGroq(
-            api_key=self.api_key,
-            model=model,
-            temperature=0.0
-        )
+    def __init__(self, model: str = "llama-3.1-8b-instant"):
+        self.model = model
+        self.llm = chat_model(model, temperature=0.0)
 
         # Updated prompt: return search queries instead of long bullet notes
         self.prompt = PromptTemplate(
@@ -40,7 +34,10 @@ class NotesAgent:
         """
         Extracts short, search-friendly keywords from notes.
         """
-        response = self.chain.run(text=text)
+        response = get_artifact_cache().get_or_create(
+            "topics", TOPICS_PROMPT_VERSION, self.model, text,
+            lambda: self.chain.run(text=text)
+        )
 
         # Expect comma-separated keywords
         if "," in response:
@@ -0,0 +1,111 @@
+"""int8 ONNX Runtime backend for bge-m3 on CPU.
+
+Export once, then point ``ONNX_MODEL_DIR`` at the output and set
+``EMBEDDING_BACKEND=onnx-int8``::
+
+    python -m services.onnx_embeddings export --out models/bge-m3-int8
+"""
+import argparse
+import logging
+import os
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+QUANTIZED_FILE = "model.int8.onnx"
+FP32_FILE = "model.onnx"
+
+
+class OnnxEmbeddings(Embeddings):
+    """bge-m3 sentence embeddings (CLS pooling, optional L2 norm) via ONNX Runtime."""
+
+    def __init__(self, model_dir, normalize=True, batch_size=16, max_length=8192, threads=0):
+        try:
+            import onnxruntime as ort
+            from transformers import AutoTokenizer
+        except ImportError as e:
+            raise ImportError("The onnx-int8 embedding backend needs `onnxruntime` and `transformers`.") from e
+
+        model_path = os.path.join(model_dir, QUANTIZED_FILE)
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(
+                f"{model_path} not found. Run `python -m services.onnx_embeddings export --out {model_dir}` first."
+            )
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.normalize = normalize
+        self.batch_size = batch_size
+        self.max_length = max_length
+
+    def _encode_batch(self, texts):
+        encoded = self.tokenizer(
+            texts, padding=True, truncation=True, max_length=self.max_length, return_tensors="np"
+        )
+        feeds = {name: encoded[name].astype(np.int64) for name in self.input_names if name in encoded}
+        last_hidden_state = self.session.run(None, feeds)[0]
+        vectors = last_hidden_state[:, 0]
+        if self.normalize:
+            vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return vectors
+
+    def embed_documents(self, texts):
+        if not texts:
+            return []
+        # Sort by length so each batch pads to a similar size, then restore order.
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            for i, vector in zip(batch, self._encode_batch([texts[i] for i in batch])):
+                vectors[i] = vector.tolist()
+        return vectors
+
+    def embed_query(self, text):
+        return self._encode_batch([text])[0].tolist()
+
+
+def export_quantized_model(model_name, out_dir, opset=17):
+    """Export ``model_name`` to ONNX and write a dynamically int8-quantized copy."""
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(out_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).eval()
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    fp32_path = os.path.join(out_dir, FP32_FILE)
+    dynamic = {0: "batch", 1: "sequence"}
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (sample["input_ids"], sample["attention_mask"]),
+            fp32_path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={"input_ids": dynamic, "attention_mask": dynamic, "last_hidden_state": dynamic},
+            opset_version=opset,
+        )
+    quantized_path = os.path.join(out_dir, QUANTIZED_FILE)
+    quantize_dynamic(fp32_path, quantized_path, weight_type=QuantType.QInt8)
+    tokenizer.save_pretrained(out_dir)
+    logger.info(f"Wrote {quantized_path} ({os.path.getsize(quantized_path) / 1e6:.0f} MB)")
+    return quantized_path
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Export bge-m3 to int8 ONNX")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export")
+    export.add_argument("--model", default=os.getenv("EMBEDDING_MODEL", "BAAI/bge-m3"))
+    export.add_argument("--out", default=os.getenv("ONNX_MODEL_DIR", "models/bge-m3-int8"))
+    args = parser.parse_args()
+    export_quantized_model(args.model, args.out)
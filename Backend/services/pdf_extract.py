@@ -0,0 +1,134 @@
+import io
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from PyPDF2 import PdfReader
+
+logger = logging.getLogger(__name__)
+
+# Below this many pages the pool round-trip costs more than it saves.
+PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "32"))
+
+_POOL = None
+_POOL_WORKERS = 0
+_POOL_LOCK = threading.Lock()
+
+# Worker-side: the document this worker last opened, as (path, reader). It is
+# dropped after PDF_READER_IDLE_SECONDS without work, so a finished job does
+# not leave a parsed copy of its PDF in every worker.
+READER_IDLE_SECONDS = float(os.getenv("PDF_READER_IDLE_SECONDS", "2"))
+_worker_reader = None
+_worker_release_timer = None
+
+
+def get_extract_workers():
+    """Worker count from ``PDF_EXTRACT_WORKERS`` (defaults to every core)."""
+    workers = int(os.getenv("PDF_EXTRACT_WORKERS", "0"))
+    return workers if workers > 0 else (os.cpu_count() or 1)
+
+
+def _get_pool(workers):
+    global _POOL, _POOL_WORKERS
+    with _POOL_LOCK:
+        if _POOL is None or _POOL_WORKERS != workers:
+            if _POOL is not None:
+                _POOL.shutdown(wait=False)
+            # spawn: forking a process that already runs torch/uvicorn threads can deadlock
+            context = multiprocessing.get_context(os.getenv("PDF_EXTRACT_START_METHOD", "spawn"))
+            _POOL = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+            _POOL_WORKERS = workers
+        return _POOL
+
+
+def _extract_range(reader, start, end):
+    pages = []
+    for page_num in range(start, end):
+        try:
+            page_text = reader.pages[page_num].extract_text() or ""
+        except Exception as e:
+            logger.error(f"Error extracting text from page {page_num + 1}: {e}")
+            page_text = ""
+        pages.append((page_num + 1, page_text))
+    return pages
+
+
+def _release_worker_reader():
+    global _worker_reader
+    _worker_reader = None
+
+
+def _extract_file_range(path, start, end):
+    """Worker entry point: the PDF is read from ``path`` once per worker, not once per range."""
+    global _worker_reader, _worker_release_timer
+    if _worker_release_timer is not None:
+        _worker_release_timer.cancel()
+    cached = _worker_reader
+    if cached is None or cached[0] != path:
+        with open(path, "rb") as f:
+            cached = _worker_reader = (path, PdfReader(io.BytesIO(f.read())))
+    try:
+        return _extract_range(cached[1], start, end)
+    finally:
+        _worker_release_timer = threading.Timer(READER_IDLE_SECONDS, _release_worker_reader)
+        _worker_release_timer.daemon = True
+        _worker_release_timer.start()
+
+
+def _page_ranges(num_pages, workers):
+    # A few ranges per worker so one slow, image-heavy range does not hold up the rest.
+    parts = min(num_pages, workers * 4)
+    size, extra = divmod(num_pages, parts)
+    ranges, start = [], 0
+    for i in range(parts):
+        end = start + size + (1 if i < extra else 0)
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+
+def extract_pages(pdf_source, workers=None, on_progress=None):
+    """Extract text from every page of a PDF.
+
+    ``pdf_source`` is raw bytes or a binary file object. Returns a list of
+    ``(page_number, text)`` tuples in page order, page numbers starting at 1.
+    Large documents are split into page ranges and extracted in a process
+    pool; ``on_progress(pages_done, total_pages)`` is called as ranges finish.
+    """
+    pdf_bytes = pdf_source if isinstance(pdf_source, (bytes, bytearray)) else pdf_source.read()
+    reader = PdfReader(io.BytesIO(pdf_bytes))
+    num_pages = len(reader.pages)
+    workers = workers or get_extract_workers()
+
+    if workers <= 1 or num_pages < PARALLEL_MIN_PAGES:
+        pages = _extract_range(reader, 0, num_pages)
+        if on_progress:
+            on_progress(num_pages, num_pages)
+        return pages
+
+    # Workers read the bytes from a temp file rather than receiving a pickled copy per range
+    fd, path = tempfile.mkstemp(prefix="pdf-extract-", suffix=".pdf")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(pdf_bytes)
+        pool = _get_pool(workers)
+        futures = [pool.submit(_extract_file_range, path, start, end)
+                   for start, end in _page_ranges(num_pages, workers)]
+        pages, done = [], 0
+        for future in futures:
+            chunk = future.result()
+            pages.extend(chunk)
+            done += len(chunk)
+            if on_progress:
+                on_progress(done, num_pages)
+    finally:
+        os.remove(path)
+    logger.info(f"Extracted {num_pages} pages with {workers} workers")
+    return pages
+
+
+def join_pages(pages):
+    return "\n".join(text for _, text in pages if text)
@@ -0,0 +1,15 @@
+# Prompt versions and model ids that key cached LLM artifacts. Kept free of
+# imports so the Streamlit app can share cache keys with the API without
+# loading the API's services. Bump a version whenever its prompt (or, for
+# units, the segmentation rules) changes, so cached results are not reused.
+
+UNIT_PROMPT_VERSION = "3"
+UNIT_MODEL = "llama3-8b-8192"
+
+SUMMARY_PROMPT_VERSION = "1"
+SUMMARY_MODEL = "llama3-8b-8192"
+
+STUDY_PLAN_PROMPT_VERSION = "1"
+STUDY_PLAN_MODEL = "llama3-8b-8192"
+
+TOPICS_PROMPT_VERSION = "1"
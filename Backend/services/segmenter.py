@@ -0,0 +1,155 @@
+import re
+
+# Unit-level markers: "UNIT I", "Unit-2: ...", "CHAPTER 3", "Module IV", "Part 1", "Lesson 5"
+UNIT_LINE_RE = re.compile(
+    r"^[ \t]*((UNIT|CHAPTER|MODULE|PART|LESSON)\b[ \t\-:.]*([IVXLC]+|\d+)\b[^\n]{0,100}?)[ \t]*$",
+    re.IGNORECASE | re.MULTILINE,
+)
+# Top-level numbered headings: "1 Introduction", "2. Relational Model" (not "2.1 ...")
+NUMBERED_LINE_RE = re.compile(r"^[ \t]*((\d{1,2})\.?[ \t]+[A-Z][^\n.!?:]{2,80})[ \t]*$", re.MULTILINE)
+# Short all-caps lines: "NORMALIZATION", "TRANSACTION MANAGEMENT"
+CAPS_LINE_RE = re.compile(r"^[ \t]*([A-Z][A-Z0-9 &,\-/()]{5,60})[ \t]*$", re.MULTILINE)
+
+# A "unit" with less body than this before the next marker of the same kind is a
+# table-of-contents entry, not the unit itself
+MIN_UNIT_CHARS = 200
+
+_ROMAN = {"I": 1, "V": 5, "X": 10, "L": 50, "C": 100}
+
+
+def roman_to_int(numeral):
+    numeral = numeral.upper()
+    total = 0
+    for current, following in zip(numeral, numeral[1:] + " "):
+        value = _ROMAN[current]
+        total += -value if _ROMAN.get(following, 0) > value else value
+    return total
+
+
+def _number(token):
+    return int(token) if token.isdigit() else roman_to_int(token)
+
+
+class Heading:
+    __slots__ = ("title", "start", "end", "kind", "number")
+
+    def __init__(self, title, start, end, kind, number=None):
+        self.title = title
+        self.start = start  # start of the heading line
+        self.end = end  # end of the heading line
+        self.kind = kind
+        self.number = number
+
+    def __repr__(self):
+        return f"Heading({self.title!r}, {self.start})"
+
+
+class Segment:
+    """One unit: ``title`` and the ``[start, end)`` span of its body in the text."""
+
+    __slots__ = ("title", "start", "end", "heading_start")
+
+    def __init__(self, title, start, end, heading_start):
+        self.title = title
+        self.start = start
+        self.end = end
+        self.heading_start = heading_start
+
+    def __repr__(self):
+        return f"Segment({self.title!r}, {self.start}, {self.end})"
+
+
+def _looks_like_sentence(title):
+    """'Unit 2 covers the relational model.' is running text, not a heading."""
+    words = title.split()
+    return title.rstrip()[-1:] in ".,;" or len(words) > 12 or (len(words) > 3 and title[0].islower())
+
+
+def _unit_headings(text):
+    definite, ambiguous = [], []
+    for match in UNIT_LINE_RE.finditer(text):
+        heading = Heading(
+            match.group(1).strip(), match.start(), match.end(), match.group(2).upper(), _number(match.group(3))
+        )
+        (ambiguous if _looks_like_sentence(heading.title) else definite).append(heading)
+    return definite, ambiguous
+
+
+def _numbered_headings(text):
+    headings = [
+        Heading(m.group(1).strip(), m.start(), m.end(), "NUMBERED", int(m.group(2)))
+        for m in NUMBERED_LINE_RE.finditer(text)
+    ]
+    # Keep the longest run that counts 1, 2, 3, ... -- list items and stray numbers break the chain
+    chain, expected = [], 1
+    for heading in headings:
+        if heading.number == expected:
+            chain.append(heading)
+            expected += 1
+    return chain if len(chain) >= 2 else []
+
+
+def _caps_headings(text):
+    return [
+        Heading(m.group(1).strip(), m.start(), m.end(), "CAPS")
+        for m in CAPS_LINE_RE.finditer(text)
+        if len(m.group(1).split()) <= 8
+    ]
+
+
+def _drop_table_of_contents(headings, text_length):
+    """Drop markers whose body is tiny when the same unit is marked again later."""
+    kept = []
+    for i, heading in enumerate(headings):
+        next_start = headings[i + 1].start if i + 1 < len(headings) else text_length
+        repeated_later = any(
+            later.kind == heading.kind and later.number == heading.number
+            for later in headings[i + 1:]
+        )
+        if heading.number is not None and repeated_later and next_start - heading.end < MIN_UNIT_CHARS:
+            continue
+        kept.append(heading)
+    return kept
+
+
+def _drop_running_headers(headings):
+    """Page headers repeat the current unit's marker on every page."""
+    kept = []
+    for heading in headings:
+        if heading.number is not None and kept and (kept[-1].kind, kept[-1].number) == (heading.kind, heading.number):
+            continue
+        kept.append(heading)
+    return kept
+
+
+def find_unit_headings(text, classify=None):
+    """Unit headings of ``text`` in order, from one regex pass per cue.
+
+    Explicit unit/chapter markers win; otherwise a 1, 2, 3... chain of
+    numbered headings; otherwise short all-caps lines. Only candidates the
+    rules cannot settle (marker lines that read like sentences, all-caps
+    lines) are passed to ``classify(candidates, text) -> [bool]``, and are
+    dropped when no classifier is given.
+    """
+    definite, ambiguous = _unit_headings(text)
+    if not definite and not ambiguous:
+        definite = _numbered_headings(text)
+        if not definite:
+            ambiguous = _caps_headings(text)
+    if ambiguous and classify is not None:
+        verdicts = classify(ambiguous, text)
+        definite += [heading for heading, keep in zip(ambiguous, verdicts) if keep]
+    headings = sorted(definite, key=lambda heading: heading.start)
+    headings = _drop_table_of_contents(headings, len(text))
+    return _drop_running_headers(headings)
+
+
+def segment_units(text, classify=None):
+    """Split ``text`` into ``Segment``s, one per unit; text before the first unit is ignored."""
+    headings = find_unit_headings(text, classify)
+    segments = []
+    for i, heading in enumerate(headings):
+        end = headings[i + 1].start if i + 1 < len(headings) else len(text)
+        start = min(heading.end + 1, end)
+        segments.append(Segment(heading.title, start, end, heading.start))
+    return segments
@@ -0,0 +1,178 @@
+import abc
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Turn locks are striped over a fixed pool, so memory does not grow with the number of sessions
+SESSION_LOCK_STRIPES = 256
+
+
+class SessionStore(abc.ABC):
+    """Conversation state per ``(file_id, session_id)``, expired after ``ttl_seconds`` idle.
+
+    State is a JSON-serializable dict (``{"messages": [{"role", "content"}, ...],
+    "summary": ...}``) so the chat memory can be rebuilt on any worker for each request.
+    """
+
+    def __init__(self, ttl_seconds=3600):
+        self.ttl_seconds = ttl_seconds
+        self._locks = [threading.Lock() for _ in range(SESSION_LOCK_STRIPES)]
+
+    def lock(self, file_id, session_id):
+        """Serializes turns of one session within this process.
+
+        Not across processes: two uvicorn workers running turns of the same
+        session at once both start from the same stored state and the last
+        ``save`` wins. Clients send a session's turns one at a time, so this
+        only drops a turn when they do not.
+        """
+        return self._locks[hash((file_id, session_id)) % len(self._locks)]
+
+    @abc.abstractmethod
+    def load(self, file_id, session_id):
+        """The session's state dict, or ``None`` if unknown or expired."""
+
+    @abc.abstractmethod
+    def save(self, file_id, session_id, state):
+        """Store ``state`` and refresh the session's idle timer."""
+
+    @abc.abstractmethod
+    def delete(self, file_id, session_id):
+        """Forget the session; ``True`` if it existed."""
+
+    @abc.abstractmethod
+    def prune(self):
+        """Drop expired sessions; returns how many were dropped."""
+
+    def stats(self):
+        return {}
+
+    def _expired(self, updated_at, now=None):
+        return bool(self.ttl_seconds) and ((now or time.time()) - updated_at) > self.ttl_seconds
+
+
+class MemorySessionStore(SessionStore):
+    """Process-local sessions; lost on restart and not shared between workers."""
+
+    def __init__(self, ttl_seconds=3600, max_sessions=10000):
+        super().__init__(ttl_seconds)
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, file_id, session_id):
+        key = (file_id, session_id)
+        with self._lock:
+            entry = self._sessions.get(key)
+            if entry is None:
+                return None
+            updated_at, state = entry
+            if self._expired(updated_at):
+                del self._sessions[key]
+                return None
+            self._sessions.move_to_end(key)
+            return json.loads(state)
+
+    def save(self, file_id, session_id, state):
+        key = (file_id, session_id)
+        with self._lock:
+            self._sessions[key] = (time.time(), json.dumps(state))
+            self._sessions.move_to_end(key)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def delete(self, file_id, session_id):
+        with self._lock:
+            return self._sessions.pop((file_id, session_id), None) is not None
+
+    def prune(self):
+        now = time.time()
+        with self._lock:
+            expired = [key for key, (updated_at, _) in self._sessions.items() if self._expired(updated_at, now)]
+            for key in expired:
+                del self._sessions[key]
+        return len(expired)
+
+    def stats(self):
+        with self._lock:
+            return {"backend": "memory", "sessions": len(self._sessions), "ttl_seconds": self.ttl_seconds}
+
+
+class SqliteSessionStore(SessionStore):
+    """Sessions in a SQLite file (WAL mode), so they survive restarts and
+    every uvicorn worker sees the same history."""
+
+    def __init__(self, path, ttl_seconds=3600):
+        super().__init__(ttl_seconds)
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "file_id TEXT NOT NULL, session_id TEXT NOT NULL, state TEXT NOT NULL, updated_at REAL NOT NULL, "
+            "PRIMARY KEY (file_id, session_id))"
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def load(self, file_id, session_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT state, updated_at FROM sessions WHERE file_id = ? AND session_id = ?",
+                (file_id, session_id),
+            ).fetchone()
+        if row is None or self._expired(row[1]):
+            return None
+        return json.loads(row[0])
+
+    def save(self, file_id, session_id, state):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (file_id, session_id, state, updated_at) VALUES (?, ?, ?, ?)",
+                (file_id, session_id, json.dumps(state), time.time()),
+            )
+            self._conn.commit()
+
+    def delete(self, file_id, session_id):
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM sessions WHERE file_id = ? AND session_id = ?", (file_id, session_id)
+            )
+            self._conn.commit()
+            return cursor.rowcount > 0
+
+    def prune(self):
+        if not self.ttl_seconds:
+            return 0
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM sessions WHERE updated_at < ?", (time.time() - self.ttl_seconds,)
+            )
+            self._conn.commit()
+            return cursor.rowcount
+
+    def stats(self):
+        with self._lock:
+            (sessions,) = self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()
+        return {"backend": "sqlite", "path": self.path, "sessions": sessions, "ttl_seconds": self.ttl_seconds}
+
+
+def get_session_store():
+    """``CHAT_SESSION_DB`` selects the SQLite store (empty keeps sessions in
+    memory); ``CHAT_SESSION_TTL`` is the idle expiry in seconds (0 disables)."""
+    ttl_seconds = float(os.getenv("CHAT_SESSION_TTL", "3600"))
+    path = os.getenv("CHAT_SESSION_DB", "chat_sessions.sqlite3")
+    if path:
+        try:
+            return SqliteSessionStore(path, ttl_seconds=ttl_seconds)
+        except sqlite3.Error as e:
+            logger.error(f"Could not open session store {path}, keeping sessions in memory: {e}")
+    return MemorySessionStore(ttl_seconds=ttl_seconds)
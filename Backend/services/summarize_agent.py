@@ -1,8 +1,8 @@
 from langchain.chains import LLMChain
 from langchain.prompts import PromptTemplate
-from langchain_groq import ChatGroq
-import os
 import dotenv
+from services.llm_gateway import BATCH, chat_model
+from services.prompt_versions import SUMMARY_MODEL
 
 dotenv.load_dotenv()
 
@@ -19,6 +19,22 @@ Document:
 Summary:
 """
     )
-    llm = ChatGroq(model="llama3-8b-8192", api_key=os.getenv("GROQ_SUMMARIZATION_MODEL"))
-    chain = LLMChain(llm=llm, prompt=prompt)
+    chain = LLMChain(llm=chat_model(SUMMARY_MODEL, priority=BATCH), prompt=prompt)
+    return chain
+
+def get_reduce_agent():
+    prompt = PromptTemplate(
+        input_variables=["summaries"],
+        template="""
+You are an expert academic assistant. The following are summaries of consecutive sections of the same unit of a student's notes.
+Combine them into one clear, well-organized summary of the whole unit. Keep every important concept, definition and key detail,
+remove repetition, and explain things in simple terms, suitable for a student revising for exams.
+
+Section summaries:
+{summaries}
+
+Unit summary:
+"""
+    )
+    chain = LLMChain(llm=chat_model(SUMMARY_MODEL, priority=BATCH), prompt=prompt)
     return chain
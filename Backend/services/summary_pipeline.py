@@ -0,0 +1,138 @@
+import asyncio
+import logging
+import os
+import time
+import weakref
+
+from services.artifact_cache import artifact_key, get_artifact_cache
+from services.prompt_versions import SUMMARY_MODEL, SUMMARY_PROMPT_VERSION
+from services.summarize_agent import get_reduce_agent, get_summarization_agent
+from services.text_splitter import split_pages
+from services.tokens import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# Summary calls in flight at once (per event loop); Groq's rate limits are enforced by the LLM gateway
+SUMMARIZE_CONCURRENCY = int(os.getenv("SUMMARIZE_CONCURRENCY", "4"))
+# Map step input size, and most partial-summary tokens fed to one reduce call
+SUMMARY_SECTION_TOKENS = int(os.getenv("SUMMARY_SECTION_TOKENS", "1500"))
+SUMMARY_REDUCE_TOKENS = int(os.getenv("SUMMARY_REDUCE_TOKENS", "3000"))
+
+
+ARTIFACT_CACHE = get_artifact_cache()
+# Per event loop (the API server's, and each asyncio.run() from Streamlit): the
+# semaphore and the chains' async HTTP clients cannot be shared across loops
+_LOOP_STATE = weakref.WeakKeyDictionary()
+
+
+def _loop_state():
+    loop = asyncio.get_running_loop()
+    state = _LOOP_STATE.get(loop)
+    if state is None:
+        state = _LOOP_STATE[loop] = {"semaphore": asyncio.Semaphore(max(1, SUMMARIZE_CONCURRENCY))}
+    return state
+
+
+def _agent(step):
+    state = _loop_state()
+    if step not in state:
+        state[step] = get_summarization_agent() if step == "map" else get_reduce_agent()
+    return state[step]
+
+
+async def _run(step, inputs, cache_text):
+    kind = f"summary_{step}"
+    key = artifact_key(kind, SUMMARY_PROMPT_VERSION, SUMMARY_MODEL, cache_text)
+    cached = ARTIFACT_CACHE.get(key, kind)
+    if cached is not None:
+        return cached
+    async with _loop_state()["semaphore"]:
+        result = await _agent(step).arun(inputs)
+    ARTIFACT_CACHE.put(key, result, kind)
+    return result
+
+
+def split_sections(text, section_tokens=None):
+    """Token-bounded sections of ``text``, cut at headings and paragraph boundaries.
+
+    ``split_pages`` starts a new chunk at every heading; consecutive chunks are
+    packed back together up to the budget so a unit with many short
+    subsections still costs one map call per ``section_tokens``, not one per heading.
+    """
+    budget = section_tokens or SUMMARY_SECTION_TOKENS
+    sections, current, current_tokens = [], [], 0
+    for chunk in split_pages([(1, text)], chunk_tokens=budget, overlap_tokens=0):
+        if not chunk.text.strip():
+            continue
+        tokens = chunk.metadata["tokens"]
+        if current and current_tokens + tokens > budget:
+            sections.append(current)
+            current, current_tokens = [], 0
+        current.append(chunk)
+        current_tokens += tokens
+    if current:
+        sections.append(current)
+    # no overlap, so the packed chunks map onto one contiguous slice of the text
+    return [text[chunks[0].metadata["char_start"]:chunks[-1].metadata["char_end"]] for chunks in sections]
+
+
+async def summarize_section(text):
+    return await _run("map", {"chunk": text}, text)
+
+
+async def reduce_summaries(partials):
+    """Fold partial summaries into one, in rounds of reduce calls under ``SUMMARY_REDUCE_TOKENS``."""
+    while len(partials) > 1:
+        groups, current, current_tokens = [], [], 0
+        for partial in partials:
+            tokens = count_tokens(partial)
+            if current and current_tokens + tokens > SUMMARY_REDUCE_TOKENS:
+                groups.append(current)
+                current, current_tokens = [], 0
+            current.append(partial)
+            current_tokens += tokens
+        groups.append(current)
+        if len(groups) == len(partials) and len(groups) > 1:
+            # every partial fills a reduce call by itself; pair them up so the rounds still shrink
+            groups = [partials[i:i + 2] for i in range(0, len(partials), 2)]
+        joined = ["\n\n".join(group) for group in groups]
+        partials = await asyncio.gather(*(
+            _run("reduce", {"summaries": text}, text) if len(group) > 1 else _passthrough(group[0])
+            for group, text in zip(groups, joined)
+        ))
+    return partials[0]
+
+
+async def _passthrough(summary):
+    return summary
+
+
+async def summarize_text(text):
+    """Map-reduce summary of ``text`` of any length.
+
+    Sections are summarized concurrently (bounded by ``SUMMARIZE_CONCURRENCY``
+    and the gateway's rate limits) and the partials reduced hierarchically, so every
+    prompt stays bounded. Section and reduce outputs are cached by content,
+    so re-summarizing an edited unit only pays for the changed sections.
+    """
+    sections = split_sections(text)
+    if not sections:
+        return ""
+    if len(sections) == 1:
+        return await summarize_section(sections[0])
+    started = time.perf_counter()
+    results = await asyncio.gather(*(summarize_section(section) for section in sections), return_exceptions=True)
+    partials = [result for result in results if not isinstance(result, Exception)]
+    failed = len(results) - len(partials)
+    if not partials:
+        raise results[0]
+    if failed:
+        logger.error(f"{failed} of {len(sections)} sections failed to summarize; reducing the rest")
+    summary = await reduce_summaries(partials)
+    logger.info(f"Map-reduce summary of {len(sections)} sections in {time.perf_counter() - started:.2f}s")
+    return summary
+
+
+def summarize_text_blocking(text):
+    """``summarize_text`` for synchronous callers such as the Streamlit app."""
+    return asyncio.run(summarize_text(text))
@@ -0,0 +1,185 @@
+import os
+import re
+
+from services.tokens import count_tokens
+
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "256"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "48"))
+
+# "UNIT I", "Unit-2", "CHAPTER 3", "Module IV: ...", "Part 1"
+UNIT_HEADING_RE = re.compile(
+    r"^(UNIT|CHAPTER|MODULE|PART|LESSON|SECTION)\b[\s\-:.]*([IVXLC]+|\d+)\b.{0,100}$", re.IGNORECASE
+)
+# "2 Normalization", "3.1 Functional Dependencies", "4.2.1. BCNF"
+NUMBERED_HEADING_RE = re.compile(r"^(\d{1,2}(?:\.\d{1,2}){0,3})\.?\s+([A-Z][^.!?]{0,80})$")
+# A wrapped sentence ("10 Mbps Ethernet networks use CSMA and") breaks off mid-clause
+_DANGLING_RE = re.compile(
+    r"(?:[,;:\-]|\b(?:a|an|the|and|or|nor|but|of|in|on|at|to|for|from|with|by|as|into|than|that|which|"
+    r"who|is|are|was|were|be|been|has|have|had|can|could|must|should|would|will|may|might))$",
+    re.IGNORECASE,
+)
+# Most words a bare "N Title" line may have when it directly continues a paragraph
+WRAPPED_HEADING_MAX_WORDS = 4
+_SENTENCE_RE = re.compile(r"[^.!?]+(?:[.!?]+|$)\s*")
+
+
+def heading_level(line, continues_paragraph=False):
+    """Return 1 for unit/chapter markers, 2+ for numbered headings, 0 for body text.
+
+    ``continues_paragraph`` means the previous line on the page was body text:
+    a bare "3 Students ..." there is more likely a wrapped line than a heading,
+    so it only counts when its title is short.
+    """
+    if UNIT_HEADING_RE.match(line):
+        return 1
+    match = NUMBERED_HEADING_RE.match(line)
+    if not match or _DANGLING_RE.search(match.group(2).rstrip()):
+        return 0
+    number = match.group(1)
+    if continues_paragraph and "." not in number and len(match.group(2).split()) > WRAPPED_HEADING_MAX_WORDS:
+        return 0
+    return 2 + number.count(".")
+
+
+class Chunk:
+    __slots__ = ("text", "metadata")
+
+    def __init__(self, text, metadata):
+        self.text = text
+        self.metadata = metadata
+
+    def __repr__(self):
+        return f"Chunk({self.metadata!r}, {self.text[:40]!r})"
+
+
+class _Block:
+    __slots__ = ("text", "page", "start", "end", "tokens", "heading")
+
+    def __init__(self, text, page, start, end, heading=0):
+        self.text = text
+        self.page = page
+        self.start = start
+        self.end = end
+        self.tokens = count_tokens(text)
+        self.heading = heading
+
+
+def _iter_blocks(pages):
+    """Yield paragraph and heading blocks with offsets into the joined page text.
+
+    Offsets refer to ``"\\n".join(text for _, text in pages if text)`` -- the
+    same string ``pdf_extract.join_pages`` produces -- without ever building it.
+    """
+    offset = 0
+    for page_number, page_text in pages:
+        if not page_text:
+            continue
+        para_lines, para_start = [], None
+        line_start = offset
+        for line in page_text.split("\n"):
+            stripped = line.strip()
+            level = heading_level(stripped, continues_paragraph=bool(para_lines)) if stripped else 0
+            if (not stripped or level) and para_lines:
+                yield _Block("\n".join(para_lines), page_number, para_start, line_start - 1)
+                para_lines, para_start = [], None
+            if level:
+                yield _Block(stripped, page_number, line_start, line_start + len(line), heading=level)
+            elif stripped:
+                if para_start is None:
+                    para_start = line_start
+                para_lines.append(line)
+            line_start += len(line) + 1
+        if para_lines:
+            yield _Block("\n".join(para_lines), page_number, para_start, offset + len(page_text))
+        offset += len(page_text) + 1
+
+
+def _split_oversized(block, max_tokens):
+    """Break a paragraph longer than one chunk into pieces of at most ``max_tokens``.
+
+    Splits on sentences first and falls back to runs of words.
+    """
+    pieces = []
+    for match in _SENTENCE_RE.finditer(block.text):
+        sentence = match.group(0)
+        if not sentence.strip():
+            continue
+        start = block.start + match.start()
+        if count_tokens(sentence) <= max_tokens:
+            pieces.append(_Block(sentence, block.page, start, start + len(sentence)))
+            continue
+        for word_match in re.finditer(r"(?:\S+\s*){1,%d}" % max(1, int(max_tokens / 1.5)), sentence):
+            piece_start = start + word_match.start()
+            pieces.append(_Block(word_match.group(0), block.page, piece_start, piece_start + len(word_match.group(0))))
+    # Merge consecutive small pieces back up to the limit
+    merged = []
+    for piece in pieces:
+        if merged and merged[-1].tokens + piece.tokens <= max_tokens and merged[-1].page == piece.page:
+            last = merged[-1]
+            combined = _Block(last.text + piece.text, last.page, last.start, piece.end)
+            merged[-1] = combined
+        else:
+            merged.append(piece)
+    return merged
+
+
+def split_pages(pages, chunk_tokens=CHUNK_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS):
+    """Single pass, structure-aware splitter over ``[(page_number, text), ...]``.
+
+    Yields ``Chunk`` objects as soon as they are complete. Chunks never
+    straddle a heading: each unit/chapter/numbered heading starts a new
+    chunk and is recorded in ``metadata["heading"]`` as a path such as
+    ``"UNIT II > 2.3 Normal Forms"``. Chunks are bounded by ``chunk_tokens``
+    and repeat up to ``overlap_tokens`` of trailing paragraphs from the
+    previous chunk of the same section. Metadata also carries the page
+    range and ``char_start``/``char_end`` into the joined page text.
+    """
+    heading_path = []
+    buffer = []
+    buffer_tokens = 0
+    index = 0
+
+    def make_chunk():
+        return Chunk("\n".join(block.text for block in buffer), {
+            "chunk_index": index,
+            "page_start": buffer[0].page,
+            "page_end": buffer[-1].page,
+            "heading": " > ".join(title for _, title in heading_path),
+            "char_start": buffer[0].start,
+            "char_end": buffer[-1].end,
+            "tokens": buffer_tokens,
+        })
+
+    for block in _iter_blocks(pages):
+        if block.heading:
+            # Consecutive headings ("UNIT I" then "1.1 Intro") stay with the body that follows
+            if any(not b.heading for b in buffer):
+                yield make_chunk()
+                index += 1
+                buffer, buffer_tokens = [], 0
+            while heading_path and heading_path[-1][0] >= block.heading:
+                heading_path.pop()
+            heading_path.append((block.heading, block.text))
+
+        # Oversized paragraphs become pieces small enough to be carried as overlap
+        piece_tokens = max(overlap_tokens, chunk_tokens // 4)
+        pieces = [block] if block.tokens <= chunk_tokens else _split_oversized(block, piece_tokens)
+        for piece in pieces:
+            if buffer and buffer_tokens + piece.tokens > chunk_tokens:
+                yield make_chunk()
+                index += 1
+                # Carry trailing paragraphs forward as overlap
+                carried, carried_tokens = [], 0
+                for previous in reversed(buffer):
+                    if carried_tokens + previous.tokens > overlap_tokens:
+                        break
+                    carried.insert(0, previous)
+                    carried_tokens += previous.tokens
+                if carried_tokens + piece.tokens > chunk_tokens:
+                    carried, carried_tokens = [], 0
+                buffer, buffer_tokens = carried, carried_tokens
+            buffer.append(piece)
+            buffer_tokens += piece.tokens
+
+    if buffer:
+        yield make_chunk()
@@ -0,0 +1,43 @@
+import logging
+import os
+import re
+import threading
+
+logger = logging.getLogger(__name__)
+
+_WORD_RE = re.compile(r"\w+|[^\w\s]")
+
+_TOKENIZER = None
+_TOKENIZER_LOADED = False
+_TOKENIZER_LOCK = threading.Lock()
+
+
+def _get_tokenizer():
+    """HF tokenizer named by ``TOKENIZER_MODEL`` (bge-m3 by default), or ``None``."""
+    global _TOKENIZER, _TOKENIZER_LOADED
+    if not _TOKENIZER_LOADED:
+        with _TOKENIZER_LOCK:
+            if not _TOKENIZER_LOADED:
+                name = os.getenv("TOKENIZER_MODEL", os.getenv("EMBEDDING_MODEL", "BAAI/bge-m3"))
+                if name:
+                    try:
+                        from transformers import AutoTokenizer
+                        _TOKENIZER = AutoTokenizer.from_pretrained(name)
+                    except Exception as e:
+                        logger.warning(f"Tokenizer {name} unavailable, estimating token counts: {e}")
+                _TOKENIZER_LOADED = True
+    return _TOKENIZER
+
+
+def estimate_tokens(text):
+    """Cheap tokenizer-free estimate: words and punctuation, +30% for subword splits."""
+    return int(len(_WORD_RE.findall(text)) * 1.3) + 1
+
+
+def count_tokens(text):
+    if not text:
+        return 0
+    tokenizer = _get_tokenizer()
+    if tokenizer is None:
+        return estimate_tokens(text)
+    return len(tokenizer.encode(text, add_special_tokens=False))
@@ -1,52 +1,74 @@
-import json
-import os
+import hashlib
+import logging
 import re
-from langchain_groq import ChatGroq
+from services.artifact_cache import artifact_key, get_artifact_cache
+from services.llm_gateway import chat_model
+from services.prompt_versions import UNIT_MODEL, UNIT_PROMPT_VERSION
+from services.segmenter import segment_units
 
-def extract_units_from_notes(note_text):
-    prompt = f"""
-You are an expert assistant. Extract all units or chapters from the following notes and return them as a JSON dictionary like:
-{{
-  "UNIT I": "...",
-  "UNIT II": "...",
-  ...
-}}
-
-Only include valid units. Do not add any explanation or text outside the JSON.
-
-Notes:
-\"\"\"
-{note_text[:6000]}
-\"\"\"
-"""
+logger = logging.getLogger(__name__)
 
-    llm = ChatGroq(model="llama3-8b-8192", api_key=os.getenv("GROQ_API_KEY"))
-    response = llm.invoke(prompt).content
+ARTIFACT_CACHE = get_artifact_cache()
+# Most ambiguous heading candidates sent to the LLM in one classification call
+MAX_CLASSIFY_CANDIDATES = 150
 
-    try:
-        # Try extracting JSON
-        match = re.search(r'\{.*\}', response, re.DOTALL)
-        if match:
-            cleaned_json = match.group(0)
-            units = json.loads(cleaned_json)
-            if isinstance(units, dict) and units:
-                return units
-    except Exception as e:
-        print("LLM JSON parsing failed:", e)
+def find_units(note_text):
+    """Unit boundaries of ``note_text`` as ``[(title, start, end), ...]`` offsets, computed once per text."""
+    # offsets are only valid for this exact text, so key on its raw bytes rather than
+    # the whitespace-normalized hash other artifacts use
+    digest = hashlib.sha256(note_text.encode("utf-8")).hexdigest()
+    key = artifact_key("units", UNIT_PROMPT_VERSION, UNIT_MODEL, digest)
+    cached = ARTIFACT_CACHE.get(key, "units")
+    if cached is None:
+        with ARTIFACT_CACHE.lock(key):
+            # another caller may have filled it while we waited
+            cached = ARTIFACT_CACHE.get(key, "units", count=False)
+            if cached is None:
+                failed = []
+
+                def classify(candidates, text):
+                    verdicts = _classify_headings(candidates, text)
+                    if verdicts is None:
+                        failed.append(True)
+                        return [False] * len(candidates)
+                    return verdicts
 
-    # ❗Fallback: Extract using regex directly from text if LLM fails
-    print("⚠️ Falling back to regex unit extraction...")
+                segments = segment_units(note_text, classify=classify)
+                cached = {"segments": [[s.title, s.start, s.end] for s in segments]}
+                # a failed LLM call is retried next time instead of being remembered
+                if not failed:
+                    ARTIFACT_CACHE.put(key, cached, "units")
+    return [tuple(segment) for segment in cached["segments"]]
 
+def extract_units_from_notes(note_text):
+    """Units of ``note_text`` as ``{title: content}``, covering the whole document."""
     units = {}
-    current_unit = None
-    lines = note_text.split('\n')
+    for title, start, end in find_units(note_text):
+        content = note_text[start:end]
+        units[title] = units[title] + "\n" + content if title in units else content
+    return units
 
-    for line in lines:
-        line = line.strip()
-        if re.match(r'UNIT[\s\-:]*[IVXLC]+', line, re.IGNORECASE):  # matches "UNIT I", "UNIT-II", etc.
-            current_unit = line
-            units[current_unit] = ""
-        elif current_unit:
-            units[current_unit] += line + "\n"
+def _classify_headings(candidates, text):
+    """One LLM call deciding which candidate lines really start a unit or chapter; ``None`` on failure."""
+    total = len(candidates)
+    candidates = candidates[:MAX_CLASSIFY_CANDIDATES]
+    listing = "\n".join(
+        f"{i}. {heading.title} | followed by: {text[heading.end:heading.end + 120].strip()!r}"
+        for i, heading in enumerate(candidates, 1)
+    )
+    prompt = f"""
+You are segmenting a student's notes into units or chapters. Below are numbered lines from the notes, each with
+the text that follows it. Reply with the numbers of the lines that start a new unit or chapter, comma-separated,
+and nothing else. Reply "none" if no line does.
 
-    return units
+{listing}
+"""
+    try:
+        response = chat_model(UNIT_MODEL).invoke(prompt).content
+    except Exception as e:
+        logger.error(f"Heading classification failed, ignoring {len(candidates)} ambiguous headings: {e}")
+        return None
+    # candidates past the cap are treated as body text
+    chosen = {int(number) for number in re.findall(r"\d+", response)}
+    verdicts = [i in chosen for i in range(1, len(candidates) + 1)]
+    return verdicts + [False] * (total - len(verdicts))
@@ -0,0 +1,213 @@
+import logging
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from services.index_factory import index_memory_bytes
+
+logger = logging.getLogger(__name__)
+
+
+class VectorStoreEvicted(KeyError):
+    """Raised when a file_id was evicted and there is no store to reload it from."""
+
+
+def estimate_footprint(vector_store, attachments=()):
+    """Rough byte cost of a cached FAISS store: index structures, docstore text,
+    and ``attachments`` kept alongside it (objects with ``memory_bytes()``)."""
+    vector_bytes = index_memory_bytes(vector_store.index)
+    text_bytes = 0
+    for doc in getattr(vector_store.docstore, "_dict", {}).values():
+        text_bytes += sys.getsizeof(doc.page_content)
+        for value in doc.metadata.values():
+            text_bytes += sys.getsizeof(value)
+    # id mapping: one int key and one uuid string per vector
+    mapping_bytes = len(vector_store.index_to_docstore_id) * 100
+    attached_bytes = sum(attachment.memory_bytes() for attachment in attachments)
+    return vector_bytes + text_bytes + mapping_bytes + attached_bytes
+
+
+class VectorStoreCache:
+    """Thread-safe LRU + TTL cache of FAISS stores bounded by a byte budget.
+
+    Entries that fall out of the cache are reloaded through ``loader`` when
+    one is configured (the persistent index store). Without a loader the
+    file_id is remembered as evicted so callers can tell "gone" apart from
+    "never existed". In that mode ``refcount`` (file_id -> number of
+    uploads sharing it) makes the budget evict unshared entries first, since
+    losing a shared index breaks every file_id that points at it.
+
+    ``attachments(vector_store)`` lists structures callers keep per store
+    (canonical text, BM25 index) so they count against the budget too; call
+    ``resize`` after attaching one to a store that is already cached.
+
+    Concurrent misses on one file_id share a single ``loader`` call, so a cold
+    start does not unpickle the same index once per waiting request.
+    """
+
+    def __init__(self, max_bytes=0, ttl_seconds=0, loader=None, refcount=None, max_evicted_ids=10000,
+                 attachments=None):
+        self.max_bytes = max_bytes
+        self.attachments = attachments
+        self.ttl_seconds = ttl_seconds
+        self.loader = loader
+        self.refcount = refcount
+        self.max_evicted_ids = max_evicted_ids
+        self._entries = OrderedDict()  # file_id -> (vector_store, size, last_access)
+        self._evicted = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self._loading = {}  # file_id -> [lock, number of threads using it]
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.reloads = 0
+
+    def __contains__(self, file_id):
+        with self._lock:
+            return file_id in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def _footprint(self, vector_store):
+        attachments = self.attachments(vector_store) if self.attachments is not None else ()
+        return estimate_footprint(vector_store, attachments)
+
+    def put(self, file_id, vector_store):
+        size = self._footprint(vector_store)
+        with self._lock:
+            self._remove(file_id)
+            self._entries[file_id] = (vector_store, size, time.monotonic())
+            self._bytes += size
+            self._evicted.pop(file_id, None)
+            self._enforce_budget(keep=file_id)
+
+    __setitem__ = put
+
+    def get(self, file_id, default=None):
+        with self._lock:
+            entry = self._entries.get(file_id)
+            if entry is not None and self._expired(entry):
+                self._evict(file_id)
+                entry = None
+            if entry is not None:
+                vector_store, size, _ = entry
+                self._entries[file_id] = (vector_store, size, time.monotonic())
+                self._entries.move_to_end(file_id)
+                self.hits += 1
+                return vector_store
+            self.misses += 1
+            was_evicted = file_id in self._evicted
+        if self.loader is None:
+            if was_evicted:
+                raise VectorStoreEvicted(file_id)
+            return default
+
+        with self._load_lock(file_id):
+            with self._lock:
+                entry = self._entries.get(file_id)
+            if entry is not None:
+                # loaded by the thread we waited for
+                return entry[0]
+            vector_store = self.loader(file_id)
+            if vector_store is not None:
+                with self._lock:
+                    self.reloads += 1
+                self.put(file_id, vector_store)
+                return vector_store
+        if was_evicted:
+            raise VectorStoreEvicted(file_id)
+        return default
+
+    @contextmanager
+    def _load_lock(self, file_id):
+        with self._lock:
+            entry = self._loading.setdefault(file_id, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._loading[file_id]
+
+    def resize(self, vector_store):
+        """Re-measure every entry holding ``vector_store`` and enforce the budget."""
+        size = self._footprint(vector_store)
+        with self._lock:
+            for file_id, (cached, old_size, last_access) in list(self._entries.items()):
+                if cached is vector_store and size != old_size:
+                    self._entries[file_id] = (cached, size, last_access)
+                    self._bytes += size - old_size
+                    self._enforce_budget(keep=file_id)
+
+    def pop(self, file_id, default=None):
+        with self._lock:
+            entry = self._entries.get(file_id)
+            self._remove(file_id)
+            return entry[0] if entry is not None else default
+
+    def _expired(self, entry):
+        return self.ttl_seconds > 0 and time.monotonic() - entry[2] > self.ttl_seconds
+
+    def _remove(self, file_id):
+        entry = self._entries.pop(file_id, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def _evict(self, file_id):
+        self._remove(file_id)
+        self.evictions += 1
+        self._evicted[file_id] = time.time()
+        while len(self._evicted) > self.max_evicted_ids:
+            self._evicted.popitem(last=False)
+        logger.info(f"Evicted vector store {file_id} (cache now {self._bytes} bytes)")
+
+    def _enforce_budget(self, keep=None):
+        for file_id in [k for k, entry in self._entries.items() if self._expired(entry)]:
+            self._evict(file_id)
+        if self.max_bytes <= 0:
+            return
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            self._evict(self._pick_victim(keep))
+
+    def _pick_victim(self, keep):
+        candidates = [file_id for file_id in self._entries if file_id != keep]
+        if self.loader is None and self.refcount is not None:
+            unshared = [file_id for file_id in candidates if self.refcount(file_id) <= 1]
+            if unshared:
+                return unshared[0]
+        return candidates[0]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "reloads": self.reloads,
+            }
+
+
+def get_vectorstore_cache(loader=None, refcount=None, attachments=None):
+    """Build the cache from ``VECTORSTORE_CACHE_MAX_MB`` / ``VECTORSTORE_CACHE_TTL``.
+
+    A budget or TTL of 0 disables that limit.
+    """
+    max_mb = float(os.getenv("VECTORSTORE_CACHE_MAX_MB", "2048"))
+    ttl = float(os.getenv("VECTORSTORE_CACHE_TTL", "0"))
+    return VectorStoreCache(max_bytes=int(max_mb * 1024 * 1024), ttl_seconds=ttl,
+                            loader=loader, refcount=refcount, attachments=attachments)
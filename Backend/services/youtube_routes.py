@@ -46,8 +46,9 @@ router = APIRouter()
 
 notes_agent = NotesAgent()
 
+# Plain def so the blocking Groq and YouTube calls run on the threadpool
 @router.get("/recommended-videos")
-async def recommended_videos(text: str = Query(..., description="Notes or summary"),
+def recommended_videos(text: str = Query(..., description="Notes or summary"),
                              max_results: int = 5):
     """
     Generate YouTube video recommendations from notes/summary.
@@ -0,0 +1,98 @@
+import os
+import threading
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+for module in ("faiss", "httpx", "fastapi", "langchain_groq", "langchain_community"):
+    pytest.importorskip(module)
+
+# keep everything in memory: no index directory, session database or answer cache
+os.environ.setdefault("INDEX_STORE_DIR", "")
+os.environ.setdefault("CHAT_SESSION_DB", "")
+os.environ.setdefault("ANSWER_CACHE_MAX_ENTRIES", "0")
+
+import faiss
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from langchain_community.embeddings import FakeEmbeddings
+from langchain_community.vectorstores import FAISS
+
+from services import chat
+from services.dedup import DedupRegistry
+from services.vector_cache import VectorStoreCache
+
+TEXT = "Sets are collections of distinct objects."
+
+
+def wait_for(job):
+    deadline = time.monotonic() + 10
+    while not job.finished and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return job
+
+
+@pytest.fixture
+def client(monkeypatch):
+    registry = DedupRegistry()
+    monkeypatch.setattr(chat, "DEDUP_REGISTRY", registry)
+    monkeypatch.setattr(chat, "VECTORSTORE_CACHE", VectorStoreCache(refcount=registry.refcount))
+    monkeypatch.setattr(chat, "INDEX_STORE", None)
+    monkeypatch.setattr(chat, "_embed", lambda job, chunks, store=None: FAISS.from_texts(
+        [chunk.text for chunk in chunks], FakeEmbeddings(size=8), metadatas=[chunk.metadata for chunk in chunks]
+    ))
+    app = FastAPI()
+    app.include_router(chat.router)
+    return TestClient(app)
+
+
+def test_append_forks_an_index_shared_by_concurrent_uploads(client, monkeypatch):
+    extracting = threading.Event()
+
+    def extract(job, pdf_bytes):
+        extracting.wait(10)
+        return [(1, TEXT)], TEXT
+
+    monkeypatch.setattr(chat, "_extract", extract)
+    pdf = ("notes.pdf", b"%PDF-1.4 same bytes", "application/pdf")
+    first = client.post("/upload/", files={"pdf": pdf}).json()
+    second = client.post("/upload/", files={"pdf": pdf}).json()
+    assert second["job_id"] == first["job_id"]
+    assert second["file_id"] == first["file_id"]
+
+    extracting.set()
+    assert wait_for(chat.JOB_MANAGER.get(first["job_id"])).stage == "done"
+    assert chat.DEDUP_REGISTRY.refcount(first["file_id"]) == 2
+
+    extra = ("extra.pdf", b"%PDF-1.4 other bytes", "application/pdf")
+    appended = client.post("/upload/append/", data={"file_id": first["file_id"]}, files={"pdf": extra}).json()
+    assert appended["file_id"] != first["file_id"]
+    wait_for(chat.JOB_MANAGER.get(appended["job_id"]))
+    assert chat.DEDUP_REGISTRY.refcount(first["file_id"]) == 1
+
+
+class BatchedEmbeddings(FakeEmbeddings):
+    def iter_embed_documents(self, texts, batch_size=32):
+        for start in range(0, len(texts), batch_size):
+            yield [self.vector(text) for text in texts[start:start + batch_size]]
+
+    def vector(self, text):
+        return np.random.default_rng(int(text)).random(self.size).tolist()
+
+
+def test_trained_indexes_get_every_chunk_in_order(monkeypatch):
+    embeddings = BatchedEmbeddings(size=8)
+    monkeypatch.setattr(chat, "get_embeddings", lambda: embeddings)
+    monkeypatch.setattr(chat, "build_index", lambda dim, n: faiss.IndexIVFFlat(faiss.IndexFlatL2(dim), dim, 2))
+    # training completes part-way through the second batch
+    monkeypatch.setattr(chat, "training_size", lambda index, n: 0 if index.is_trained else 50)
+    texts = [str(n) for n in range(100)]
+    progress = []
+    store = chat.get_vectorstore(texts, metadatas=[{"n": n} for n in range(100)], on_progress=progress.append)
+    assert store.index.ntotal == 100
+    assert [doc.page_content for doc in chat.ordered_documents(store)] == texts
+    assert progress == [32, 64, 96, 100]
+    found = store.similarity_search_by_vector(embeddings.vector("57"), k=1)[0]
+    assert found.page_content == "57" and found.metadata == {"n": 57}
@@ -0,0 +1,51 @@
+from services.dedup import DedupRegistry, hash_text
+
+
+def test_text_hash_ignores_line_wrapping():
+    assert hash_text("Sets are\ncollections  of objects") == hash_text("Sets are collections of objects\n")
+
+
+def test_references_are_counted_until_the_last_release():
+    registry = DedupRegistry()
+    registry.register("a", bytes_hash="b1", text_hash="t1")
+    assert registry.acquire("a") == 1
+    assert registry.acquire("a", count=2) == 3
+    assert registry.release("a") == 2
+    assert registry.lookup_bytes("b1") == "a"
+    registry.release("a")
+    registry.release("a")
+    assert registry.refcount("a") == 0
+    assert registry.lookup_bytes("b1") is None
+    assert registry.lookup_text("t1") is None
+
+
+def test_aliases_resolve_to_the_canonical_file_id():
+    registry = DedupRegistry()
+    registry.acquire("canonical")
+    registry.alias("late-duplicate", "canonical")
+    assert registry.resolve("late-duplicate") == "canonical"
+    assert registry.resolve("other") == "other"
+    registry.forget("canonical")
+    assert registry.resolve("late-duplicate") == "late-duplicate"
+
+
+def test_unregister_keeps_references():
+    registry = DedupRegistry()
+    registry.register("a", bytes_hash="b1")
+    registry.acquire("a")
+    registry.unregister("a")
+    assert registry.lookup_bytes("b1") is None
+    assert registry.refcount("a") == 1
+
+
+def test_registry_survives_a_restart(tmp_path):
+    path = str(tmp_path / "dedup.json")
+    registry = DedupRegistry(path)
+    registry.register("a", bytes_hash="b1", text_hash="t1")
+    registry.acquire("a", count=2)
+    registry.alias("x", "a")
+    reloaded = DedupRegistry(path)
+    assert reloaded.lookup_bytes("b1") == "a"
+    assert reloaded.refcount("a") == 2
+    assert reloaded.resolve("x") == "a"
+    assert reloaded.stats() == {"documents": 1, "references": 2, "shared": 1, "aliases": 1}
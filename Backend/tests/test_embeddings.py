@@ -0,0 +1,38 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("langchain_community")
+
+from services.embeddings import SharedEmbeddings
+
+
+class SlowModel:
+    def __init__(self):
+        self.calls = []
+        self.started = threading.Event()
+
+    def embed_documents(self, texts):
+        self.calls.append("documents")
+        self.started.set()
+        time.sleep(0.05)
+        return [[0.0] for _ in texts]
+
+    def embed_query(self, text):
+        self.calls.append("query")
+        return [0.0]
+
+
+def test_query_goes_ahead_of_queued_ingestion():
+    embeddings = SharedEmbeddings(cache=None)
+    embeddings._model = model = SlowModel()
+    ingest = [threading.Thread(target=embeddings._encode, args=(["chunk"] * 4,)) for _ in range(2)]
+    ingest[0].start()
+    model.started.wait(1)
+    ingest[1].start()
+    time.sleep(0.01)
+    embeddings.embed_query("question")
+    for thread in ingest:
+        thread.join()
+    assert model.calls[:2] == ["documents", "query"]
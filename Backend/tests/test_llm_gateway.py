@@ -0,0 +1,172 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("langchain_groq")
+
+from services.llm_gateway import BATCH, INTERACTIVE, LLMGateway, RateScheduler, SingleFlight
+
+
+def run_threads(targets):
+    threads = [threading.Thread(target=target) for target in targets]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+
+def test_identical_calls_share_one_upstream_call():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls, results = [], []
+
+    def create():
+        calls.append(1)
+        release.wait(5)
+        return {"answer": 42}
+
+    def caller():
+        results.append(flight.do("key", create))
+
+    leader = threading.Thread(target=caller)
+    leader.start()
+    while not flight.stats()["in_flight"]:
+        time.sleep(0.001)
+    followers = [threading.Thread(target=caller) for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    while flight.stats()["coalesced"] < 3:
+        time.sleep(0.001)
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join(5)
+    assert len(calls) == 1
+    assert results == [{"answer": 42}] * 4
+    # followers get copies, so mutating one result does not change the others
+    assert len({id(result) for result in results}) == 4
+    assert flight.stats() == {"upstream": 1, "coalesced": 3, "in_flight": 0}
+
+
+def test_errors_reach_every_waiter():
+    flight = SingleFlight()
+    release = threading.Event()
+    errors = []
+
+    def create():
+        release.wait(5)
+        raise ValueError("upstream failed")
+
+    def caller():
+        try:
+            flight.do("key", create)
+        except ValueError as e:
+            errors.append(str(e))
+
+    leader = threading.Thread(target=caller)
+    leader.start()
+    while not flight.stats()["in_flight"]:
+        time.sleep(0.001)
+    follower = threading.Thread(target=caller)
+    follower.start()
+    while not flight.stats()["coalesced"]:
+        time.sleep(0.001)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+    assert errors == ["upstream failed"] * 2
+    assert flight.stats() == {"upstream": 1, "coalesced": 1, "in_flight": 0}
+
+
+def test_async_waiters_coalesce_and_cancel_only_when_all_leave():
+    async def scenario():
+        flight = SingleFlight()
+        started, cancelled = asyncio.Event(), asyncio.Event()
+
+        async def create():
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        first = asyncio.create_task(flight.do_async("key", create))
+        await started.wait()
+        second = asyncio.create_task(flight.do_async("key", create))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0.01)
+        assert not cancelled.is_set()
+        second.cancel()
+        await asyncio.wait_for(cancelled.wait(), 1)
+        assert flight.stats() == {"upstream": 1, "coalesced": 1, "in_flight": 0}
+
+        async def answer():
+            return "fresh"
+
+        assert await flight.do_async("key", answer) == "fresh"
+
+    asyncio.run(scenario())
+
+
+def test_interactive_calls_go_first():
+    scheduler = RateScheduler(rpm=600, tpm=0)
+    scheduler.requests.level = 0
+    admitted = []
+
+    def call(priority, delay):
+        time.sleep(delay)
+        scheduler.acquire(10, priority)
+        admitted.append(priority)
+
+    run_threads([lambda: call(BATCH, 0), lambda: call(INTERACTIVE, 0.02)])
+    assert admitted == [INTERACTIVE, BATCH]
+
+
+def test_batch_calls_leave_the_reserve():
+    scheduler = RateScheduler(rpm=100, tpm=0, batch_reserve=0.5)
+    scheduler.requests.level = 30
+    batch = scheduler._enqueue(BATCH)
+    assert scheduler._poll(batch, 10) > 0
+    scheduler._leave(batch)
+    interactive = scheduler._enqueue(INTERACTIVE)
+    assert scheduler._poll(interactive, 10) == 0
+
+
+def test_token_charge_is_settled_and_pauses_apply_to_everyone():
+    scheduler = RateScheduler(rpm=0, tpm=1000)
+    scheduler.acquire(300)
+    scheduler.settle(300, 100)
+    assert 890 < scheduler.tokens.level <= 1000
+    scheduler.pause(0.2)
+    started = time.monotonic()
+    scheduler.acquire(10)
+    assert time.monotonic() - started >= 0.15
+
+
+class ServerError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+def test_gateway_retries_server_errors_but_not_client_errors():
+    gateway = LLMGateway(rpm=0, tpm=0, max_retries=3, retry_base=0.001, retry_max=0.01)
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ServerError(503)
+        return "ok"
+
+    assert gateway.call("model", INTERACTIVE, 10, flaky) == "ok"
+    assert len(attempts) == 3
+
+    def rejected():
+        raise ServerError(400)
+
+    with pytest.raises(ServerError):
+        gateway.call("model", INTERACTIVE, 10, rejected)
@@ -0,0 +1,32 @@
+import io
+import time
+
+import pytest
+
+PyPDF2 = pytest.importorskip("PyPDF2")
+
+from services import pdf_extract
+
+
+def blank_pdf(pages):
+    writer = PyPDF2.PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=200, height=200)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def test_parallel_extraction_keeps_page_order():
+    pages = pdf_extract.extract_pages(blank_pdf(40), workers=2)
+    assert [number for number, _ in pages] == list(range(1, 41))
+
+
+def test_worker_reader_is_dropped_when_idle(tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf_extract, "READER_IDLE_SECONDS", 0.05)
+    path = tmp_path / "doc.pdf"
+    path.write_bytes(blank_pdf(3))
+    assert len(pdf_extract._extract_file_range(str(path), 0, 2)) == 2
+    assert pdf_extract._worker_reader[0] == str(path)
+    time.sleep(0.2)
+    assert pdf_extract._worker_reader is None
@@ -0,0 +1,33 @@
+from services.segmenter import find_unit_headings, roman_to_int, segment_units
+
+BODY = "Sets are collections of distinct objects. " * 10
+
+
+def test_roman_numerals():
+    assert [roman_to_int(n) for n in ("I", "IV", "IX", "XIV", "xl")] == [1, 4, 9, 14, 40]
+
+
+def test_units_cover_their_bodies():
+    text = f"Preface\nUNIT I Logic\n{BODY}\nUNIT II Sets\n{BODY}end"
+    segments = segment_units(text)
+    assert [s.title for s in segments] == ["UNIT I Logic", "UNIT II Sets"]
+    assert text[segments[0].start:segments[0].end].strip() == BODY.strip()
+    assert text[segments[1].start:segments[1].end].endswith("end")
+
+
+def test_table_of_contents_entries_are_dropped():
+    toc = "Contents\nUNIT I Logic\nUNIT II Sets\n"
+    text = f"{toc}UNIT I Logic\n{BODY}\nUNIT II Sets\n{BODY}"
+    headings = find_unit_headings(text)
+    assert [h.start for h in headings] == [text.index("UNIT I", len(toc)), text.index("UNIT II", len(toc))]
+
+
+def test_running_headers_are_dropped():
+    text = f"UNIT I Logic\n{BODY}\nUNIT I Logic\n{BODY}\nUNIT II Sets\n{BODY}"
+    assert [h.title for h in find_unit_headings(text)] == ["UNIT I Logic", "UNIT II Sets"]
+
+
+def test_sentences_need_the_classifier():
+    text = f"UNIT I Logic\n{BODY}\nUnit 2 is where the relational model is covered in this course.\n{BODY}"
+    assert [h.title for h in find_unit_headings(text)] == ["UNIT I Logic"]
+    assert len(find_unit_headings(text, classify=lambda candidates, _: [True] * len(candidates))) == 2
@@ -0,0 +1,16 @@
+from services.sessions import MemorySessionStore, SqliteSessionStore
+
+
+def test_turn_locks_do_not_grow_with_sessions():
+    store = MemorySessionStore()
+    locks = {id(store.lock("file", str(n))) for n in range(5000)}
+    assert len(locks) <= 256
+    assert store.lock("file", "a") is store.lock("file", "a")
+
+
+def test_sqlite_sessions_round_trip(tmp_path):
+    store = SqliteSessionStore(str(tmp_path / "sessions.sqlite3"), ttl_seconds=60)
+    store.save("file", "a", {"messages": [], "summary": ""})
+    assert store.load("file", "a") == {"messages": [], "summary": ""}
+    assert store.delete("file", "a")
+    assert store.load("file", "a") is None
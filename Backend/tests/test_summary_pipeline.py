@@ -0,0 +1,18 @@
+import pytest
+
+pytest.importorskip("langchain_groq")
+
+from services.summary_pipeline import split_sections
+
+SUBSECTIONS = "\n".join(f"1.{i} Topic {i}\nA short paragraph about topic {i}." for i in range(1, 21))
+
+
+def test_short_subsections_share_one_section():
+    assert split_sections(SUBSECTIONS, section_tokens=1500) == [SUBSECTIONS]
+
+
+def test_sections_stay_under_the_budget_and_cover_the_text():
+    sections = split_sections(SUBSECTIONS, section_tokens=60)
+    assert 1 < len(sections) < 20
+    assert all(section.startswith("1.") for section in sections)
+    assert "\n".join(sections) == SUBSECTIONS
@@ -0,0 +1,63 @@
+import pytest
+
+from services.text_splitter import heading_level, split_pages
+
+
+@pytest.mark.parametrize("line", [
+    "10 Mbps Ethernet networks use CSMA and",
+    "3 Students enrolled in the lab must",
+    "2 Relational algebra, tuple calculus,",
+])
+def test_wrapped_sentences_are_not_headings(line):
+    assert heading_level(line) == 0
+
+
+@pytest.mark.parametrize("line, level", [
+    ("2 Normalization", 2),
+    ("3.1 Functional Dependencies", 3),
+    ("4.2.1. BCNF", 4),
+    ("UNIT II Relational Model", 1),
+])
+def test_numbered_headings(line, level):
+    assert heading_level(line) == level
+    assert heading_level(line, continues_paragraph=True) == level
+
+
+def test_long_bare_number_line_inside_a_paragraph_is_body_text():
+    assert heading_level("7 Layers Of The OSI Reference Model", continues_paragraph=True) == 0
+    assert heading_level("7 Layers Of The OSI Reference Model") == 2
+
+
+def test_wrapped_line_keeps_the_section_together():
+    text = ("2 Networks\nShared media need an access protocol. Classic\n"
+            "10 Mbps Ethernet networks use CSMA and\ncollision detection to share the wire.")
+    chunks = list(split_pages([(1, text)], chunk_tokens=200, overlap_tokens=0))
+    assert len(chunks) == 1
+    assert chunks[0].metadata["heading"] == "2 Networks"
+
+
+def test_offsets_point_into_the_joined_page_text():
+    pages = [
+        (1, "UNIT I Logic\nPropositions are statements.\nThey are true or false."),
+        (2, ""),
+        (3, "1.1 Connectives\nAnd, or and not combine them.\n1.2 Truth Tables\nEach row is one assignment."),
+    ]
+    joined = "\n".join(text for _, text in pages if text)  # what pdf_extract.join_pages builds
+    chunks = list(split_pages(pages, chunk_tokens=200, overlap_tokens=0))
+    assert [chunk.metadata["heading"] for chunk in chunks] == [
+        "UNIT I Logic", "UNIT I Logic > 1.1 Connectives", "UNIT I Logic > 1.2 Truth Tables",
+    ]
+    assert [(c.metadata["page_start"], c.metadata["page_end"]) for c in chunks] == [(1, 1), (3, 3), (3, 3)]
+    for chunk in chunks:
+        assert joined[chunk.metadata["char_start"]:chunk.metadata["char_end"]] == chunk.text
+    assert [chunk.metadata["chunk_index"] for chunk in chunks] == [0, 1, 2]
+
+
+def test_long_sections_overlap_within_the_section():
+    body = "\n".join(f"Sentence number {n} about sets." for n in range(40))
+    chunks = list(split_pages([(1, f"2 Sets\n{body}")], chunk_tokens=40, overlap_tokens=10))
+    assert len(chunks) > 2
+    assert all(chunk.metadata["tokens"] <= 40 for chunk in chunks)
+    assert all(chunk.metadata["heading"] == "2 Sets" for chunk in chunks)
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert chunk.metadata["char_start"] < previous.metadata["char_end"]
@@ -0,0 +1,30 @@
+import pytest
+
+pytest.importorskip("langchain_groq")
+
+from services import unit
+from services.artifact_cache import ArtifactCache
+
+BODY = "Sets are collections of distinct objects. " * 10
+
+
+@pytest.fixture(autouse=True)
+def memory_cache(monkeypatch):
+    monkeypatch.setattr(unit, "ARTIFACT_CACHE", ArtifactCache(None))
+
+
+def test_whitespace_variants_get_their_own_offsets():
+    compact = f"UNIT I Logic\n{BODY}\nUNIT II Sets\n{BODY}tail"
+    # what the Streamlit reader produces for the same PDF, with empty pages kept
+    spaced = compact.replace("\nUNIT II", "\n\n\n\nUNIT II")
+    assert unit.extract_units_from_notes(compact)["UNIT II Sets"].startswith("Sets are")
+    units = unit.extract_units_from_notes(spaced)
+    assert units["UNIT II Sets"].startswith("Sets are")
+    assert units["UNIT II Sets"].endswith("tail")
+
+
+def test_units_are_computed_once_per_text(monkeypatch):
+    text = f"UNIT I Logic\n{BODY}\nUNIT II Sets\n{BODY}"
+    first = unit.find_units(text)
+    monkeypatch.setattr(unit, "segment_units", lambda *args, **kwargs: pytest.fail("not cached"))
+    assert unit.find_units(text) == first
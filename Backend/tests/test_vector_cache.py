@@ -0,0 +1,71 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("faiss")
+
+from services import vector_cache
+from services.vector_cache import VectorStoreCache, VectorStoreEvicted
+
+
+class Store:
+    def __init__(self, size):
+        self.size = size
+
+
+@pytest.fixture(autouse=True)
+def sized_stores(monkeypatch):
+    monkeypatch.setattr(vector_cache, "estimate_footprint", lambda store, attachments=(): store.size + sum(a.size for a in attachments))
+
+
+def test_concurrent_misses_share_one_load():
+    calls = []
+
+    def loader(file_id):
+        calls.append(file_id)
+        time.sleep(0.05)
+        return Store(10)
+
+    cache = VectorStoreCache(loader=loader)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get("a"))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert calls == ["a"]
+    assert len(results) == 8 and all(result is results[0] for result in results)
+    assert cache.stats()["reloads"] == 1
+    assert not cache._loading
+
+
+def test_budget_evicts_least_recently_used():
+    cache = VectorStoreCache(max_bytes=25)
+    cache.put("a", Store(10))
+    cache.put("b", Store(10))
+    cache.get("a")
+    cache.put("c", Store(10))
+    assert "a" in cache and "c" in cache and "b" not in cache
+    with pytest.raises(VectorStoreEvicted):
+        cache.get("b")
+    assert cache.get("never") is None
+
+
+def test_shared_entries_are_evicted_last_without_a_loader():
+    shared = {"a"}
+    cache = VectorStoreCache(max_bytes=25, refcount=lambda file_id: 2 if file_id in shared else 1)
+    cache.put("a", Store(10))
+    cache.put("b", Store(10))
+    cache.put("c", Store(10))
+    assert "a" in cache and "b" not in cache
+
+
+def test_resize_counts_attachments():
+    attached = {}
+    cache = VectorStoreCache(max_bytes=100, attachments=lambda store: attached.get(store, ()))
+    store = Store(10)
+    cache.put("a", store)
+    attached[store] = [Store(5)]
+    cache.resize(store)
+    assert cache.stats()["bytes"] == 15
@@ -4,6 +4,7 @@ import { useFiles } from '@/contexts/FileProvider';
 import { Button } from '@/components/ui/button';
 import { Card, CardContent, CardHeader, CardTitle } from '@/components/ui/card';
 import { Textarea } from '@/components/ui/textarea';
+import { fetchWhenReady, waitForJob } from '@/services/jobService';
 
 interface Message {
   id: string;
@@ -24,7 +25,9 @@ const Chat = () => {
   ]);
   const [inputValue, setInputValue] = useState('');
   const [isLoading, setIsLoading] = useState(false);
+  const [isProcessing, setIsProcessing] = useState(false);
   const [fileId, setFileId] = useState<string | null>(null);
+  const [sessionId, setSessionId] = useState<string | null>(null);
 
   // Upload file to FastAPI
   const handleFileUpload = async (event: React.ChangeEvent<HTMLInputElement>) => {
@@ -43,21 +46,30 @@ const Chat = () => {
         const data = await res.json();
 
         if (data.file_id) {
-          setFileId(data.file_id);
-          localStorage.setItem("pdf_file_id", data.file_id); // <-- persist file_id
-          const uploadMessage: Message = {
+          setSessionId(null); // new document, new conversation
+          const say = (content: string) => setMessages(prev => [...prev, {
             id: Date.now().toString(),
-            content: `I've uploaded "${file.name}". Now I can answer questions about this document!`,
+            content,
             sender: 'ai',
             timestamp: new Date(),
-          };
-          setMessages(prev => [...prev, uploadMessage]);
+          }]);
+          // The index is built in the background; chat is enabled once the job is done
+          if (data.job_id && data.status !== 'done') {
+            setIsProcessing(true);
+            say(`I'm reading "${file.name}"... this can take a moment for large PDFs.`);
+            await waitForJob(data.job_id);
+          }
+          setFileId(data.file_id);
+          localStorage.setItem("pdf_file_id", data.file_id); // <-- persist file_id
+          say(`I've uploaded "${file.name}". Now I can answer questions about this document!`);
         } else {
-          alert(data.error || "Error uploading file.");
+          alert(data.error || data.detail || "Error uploading file.");
         }
-      } catch (err) {
+      } catch (err: any) {
         console.error(err);
-        alert("Failed to upload file.");
+        alert(err?.message || "Failed to upload file.");
+      } finally {
+        setIsProcessing(false);
       }
     }
   };
@@ -65,8 +77,8 @@ const Chat = () => {
   // Send question to FastAPI
   const handleSendMessage = async () => {
     if (!inputValue.trim()) return;
-    if (!fileId) {
-      alert("Please upload a PDF first.");
+    if (!fileId || isProcessing) {
+      alert(isProcessing ? "Your PDF is still being processed." : "Please upload a PDF first.");
       return;
     }
 
@@ -84,26 +96,49 @@ const Chat = () => {
     const formData = new FormData();
     formData.append("user_question", inputValue);
     formData.append("file_id", fileId);
+    if (sessionId) formData.append("session_id", sessionId);
+
+    const aiId = (Date.now() + 1).toString();
+    const appendToAnswer = (text: string) =>
+      setMessages(prev => prev.map(m => (m.id === aiId ? { ...m, content: m.content + text } : m)));
 
     try {
-      const res = await fetch("http://127.0.0.1:8000/chat/", {
+      // a 202 means the document is still being indexed: wait for it rather than parse JSON as SSE
+      const res = await fetchWhenReady("http://127.0.0.1:8000/chat/stream/", {
         method: "POST",
         body: formData
       });
-      const data = await res.json();
+      const isStream = res.headers.get("content-type")?.startsWith("text/event-stream");
+      if (!res.ok || !res.body || !isStream) {
+        const detail = await res.json().then(data => data.detail, () => null);
+        throw new Error(typeof detail === "string" ? detail : `Chat failed with status ${res.status}`);
+      }
 
-      const aiMessage: Message = {
-        id: (Date.now() + 1).toString(),
-        content: data.answer || "No answer from server.",
-        sender: 'ai',
-        timestamp: new Date(),
-      };
-      setMessages(prev => [...prev, aiMessage]);
-    } catch (err) {
+      setMessages(prev => [...prev, { id: aiId, content: '', sender: 'ai', timestamp: new Date() }]);
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      for (;;) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split("\n\n");
+        buffer = events.pop() ?? '';
+        for (const raw of events) {
+          const event = raw.match(/^event: (.*)$/m)?.[1];
+          const data = JSON.parse(raw.match(/^data: (.*)$/m)?.[1] ?? 'null');
+          if (event === 'sources' && data.session_id) setSessionId(data.session_id);
+          else if (event === 'token') {
+            setIsLoading(false); // first token: stop the spinner
+            appendToAnswer(data.text);
+          } else if (event === 'error') appendToAnswer(data.detail);
+        }
+      }
+    } catch (err: any) {
       console.error(err);
-      setMessages(prev => [...prev, {
-        id: (Date.now() + 1).toString(),
-        content: "Error contacting AI.",
+      setMessages(prev => [...prev.filter(m => m.id !== aiId), {
+        id: aiId,
+        content: err?.message ? `Error contacting AI: ${err.message}` : "Error contacting AI.",
         sender: 'ai',
         timestamp: new Date()
       }]);
@@ -241,11 +276,11 @@ const Chat = () => {
                   onKeyPress={handleKeyPress}
                   placeholder="Ask questions about your uploaded materials..."
                   className="flex-1 min-h-[40px] max-h-[120px] resize-none"
-                  disabled={isLoading}
+                  disabled={isLoading || isProcessing}
                 />
                 <Button
                   onClick={handleSendMessage}
-                  disabled={!inputValue.trim() || isLoading}
+                  disabled={!inputValue.trim() || isLoading || isProcessing}
                   className="bg-sky-500 hover:bg-sky-600"
                 >
                   <Send className="h-4 w-4" />
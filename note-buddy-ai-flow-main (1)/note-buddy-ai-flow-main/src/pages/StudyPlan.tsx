@@ -10,6 +10,7 @@ import { Textarea } from '@/components/ui/textarea';
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from '@/components/ui/select';
 import { Dialog, DialogContent, DialogHeader, DialogTitle, DialogTrigger } from '@/components/ui/dialog';
 import { useToast } from '@/hooks/use-toast';
+import { fetchWhenReady } from '@/services/jobService';
 
 interface StudyTask {
   id: string;
@@ -138,7 +139,8 @@ const StudyPlan = () => {
       const formData = new FormData();
       formData.append("file_id", fileId);
 
-  const response = await fetch(`http://localhost:8000/study-plan/?_=${Date.now()}`, {
+      // waits for the upload to finish processing if it has not yet
+      const response = await fetchWhenReady(`http://localhost:8000/study-plan/?_=${Date.now()}`, {
         method: "POST",
         body: formData,
       });
@@ -4,6 +4,7 @@ import { useFiles } from '@/contexts/FileProvider';
 import { Button } from '@/components/ui/button';
 import { Card, CardContent, CardHeader, CardTitle } from '@/components/ui/card';
 import { useToast } from '@/hooks/use-toast';
+import { fetchWhenReady } from '@/services/jobService';
 
 const Summarize = () => {
   const { uploadedFiles, getFileContent } = useFiles();
@@ -36,7 +37,8 @@ const Summarize = () => {
       const formData = new FormData();
       formData.append("file_id", fileId);
 
-      const response = await fetch("http://127.0.0.1:8000/summarize/", {
+      // waits for the upload to finish processing if it has not yet
+      const response = await fetchWhenReady("http://127.0.0.1:8000/summarize/", {
         method: "POST",
         body: formData,
       });
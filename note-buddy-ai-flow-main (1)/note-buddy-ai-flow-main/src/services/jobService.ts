@@ -0,0 +1,43 @@
+const API_BASE_URL = "http://127.0.0.1:8000";
+const POLL_INTERVAL_MS = 1000;
+
+export interface IngestionJob {
+  job_id: string;
+  file_id: string;
+  stage: string;
+  pages_total: number;
+  pages_processed: number;
+  chunks_total: number;
+  chunks_embedded: number;
+  eta_seconds: number | null;
+  error: string | null;
+}
+
+const sleep = (ms: number) => new Promise(resolve => setTimeout(resolve, ms));
+
+// Poll an upload/append job until its index is ready; throws with the job's error if it failed
+export const waitForJob = async (
+  jobId: string,
+  onProgress?: (job: IngestionJob) => void
+): Promise<IngestionJob> => {
+  for (;;) {
+    const res = await fetch(`${API_BASE_URL}/jobs/${jobId}`);
+    if (!res.ok) throw new Error(`Could not check processing status (${res.status})`);
+    const job: IngestionJob = await res.json();
+    onProgress?.(job);
+    if (job.stage === "done") return job;
+    if (job.stage === "failed") throw new Error(job.error || "Processing the PDF failed.");
+    await sleep(POLL_INTERVAL_MS);
+  }
+};
+
+// fetch() that waits out a 202 "PDF is still being processed" reply and retries once the job is done
+export const fetchWhenReady = async (url: string, init: RequestInit): Promise<Response> => {
+  for (;;) {
+    const res = await fetch(url, init);
+    if (res.status !== 202) return res;
+    const { detail } = await res.json();
+    if (!detail?.job_id) throw new Error(detail?.message || "PDF is still being processed.");
+    await waitForJob(detail.job_id);
+  }
+};